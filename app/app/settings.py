@@ -22,12 +22,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-lt)e=p8l+9l2o&p%#hqrpt#7$91^((3zw^7c=nhi7)w-73ztrd'
+SECRET_KEY = environ.get(
+    'SECRET_KEY', 'django-insecure-lt)e=p8l+9l2o&p%#hqrpt#7$91^((3zw^7c=nhi7)w-73ztrd')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# It also keeps every executed query in memory.
+DEBUG = environ.get('DEBUG') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in environ.get(
+    'ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',') if host]
 
 
 # Application definition
@@ -48,7 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,6 +62,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# WhiteNoise 5 is sync only: in the chain, Django would run every request,
+# async views included, on the one thread of sync_to_async. app.asgi leaves
+# it out, static files are served by the proxy in front
+ASGI_MIDDLEWARE = [name for name in MIDDLEWARE
+                   if name != 'whitenoise.middleware.WhiteNoiseMiddleware']
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -81,16 +92,85 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections are kept for DB_CONN_MAX_AGE seconds and checked before being
+# reused. With DB_POOL_MAX_SIZE each process shares at most that many,
+# waiting up to DB_POOL_TIMEOUT seconds for one to be free.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': environ.get('DB_HOST'),
         'NAME': environ.get('DB_NAME'),
         'USER': environ.get('DB_USER'),
-        'PASSWORD': environ.get('DB_PASS')
+        'PASSWORD': environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'POOL': {
+            'MAX_SIZE': int(environ.get('DB_POOL_MAX_SIZE', 0)),
+            'TIMEOUT': float(environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+#
+# Cached responses are invalidated by per user versions stored here, so
+# every process serving requests must share the cache. The process local
+# default only suits a single process; `serve` refuses to start more than
+# one worker with it.
+
+CACHES = {
+    'default': {
+        'BACKEND': environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Token lookups cached per worker, or shared through one of CACHES. serve
+# shares them through the default cache when it runs more than one worker
+TOKEN_AUTH_CACHE_SIZE = int(environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_CACHE_TTL = int(environ.get('TOKEN_AUTH_CACHE_TTL', 60))
+TOKEN_AUTH_SHARED_CACHE = environ.get('TOKEN_AUTH_SHARED_CACHE') or None
+
+
+# Requests taking at least SLOW_REQUEST_SECONDS are logged with (up to
+# SLOW_REQUEST_LOGGED_QUERIES of) their SQL
+SLOW_REQUEST_SECONDS = float(environ.get('SLOW_REQUEST_SECONDS', 1))
+SLOW_REQUEST_LOGGED_QUERIES = int(environ.get('SLOW_REQUEST_LOGGED_QUERIES', 50))
+SERVER_TIMING_HEADER = environ.get('SERVER_TIMING_HEADER', '1') == '1'
+# /metrics is served to staff sessions, and to scrapers sending
+# ``Authorization: Bearer <METRICS_TOKEN>`` when it is set
+METRICS_TOKEN = environ.get('METRICS_TOKEN') or None
+
+# Logs of the project apps, as ``message key=value ...`` lines. Debug logs
+# of hot paths are skipped unless LOG_LEVEL=DEBUG.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'keyvalue': {
+            '()': 'core.logging.KeyValueFormatter',
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'keyvalue',
+        },
+    },
+    'loggers': {
+        app: {
+            'handlers': ['console'],
+            'level': environ.get('LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        } for app in ('core', 'recepie', 'updates', 'user')
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -110,6 +190,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Passwords are hashed with PBKDF2 running this many iterations, hashes with
+# another count are upgraded on the next successful login
+PASSWORD_HASH_ITERATIONS = int(environ.get('PASSWORD_HASH_ITERATIONS', 260000))
+
+PASSWORD_HASHERS = [
+    'user.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Login password checks run on this many threads, at most LOGIN_QUEUE_DEPTH
+# more wait for one before logins are rejected with 429
+LOGIN_HASH_WORKERS = int(environ.get('LOGIN_HASH_WORKERS', 2))
+LOGIN_QUEUE_DEPTH = int(environ.get('LOGIN_QUEUE_DEPTH', 16))
+
+REST_FRAMEWORK = {
+    'DEFAULT_THROTTLE_RATES': {
+        'login_email': environ.get('LOGIN_EMAIL_RATE', '10/min'),
+        'login_ip': environ.get('LOGIN_IP_RATE', '30/min'),
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -135,6 +236,23 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 STATIC_ROOT = '/vol/web/static'
 
+# Collected static files are served compressed by WhiteNoise
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
+
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# Uploads are served by the app (core.views.media) unless SERVE_MEDIA=0,
+# for a proxy in front serving MEDIA_ROOT at MEDIA_URL
+SERVE_MEDIA = environ.get('SERVE_MEDIA', '1') == '1'
+
+# Recepie image variants are rendered by this many background threads,
+# or inline after the upload commits when eager
+RECEPIE_IMAGE_WORKERS = int(environ.get('RECEPIE_IMAGE_WORKERS', 2))
+RECEPIE_IMAGE_EAGER = environ.get('RECEPIE_IMAGE_EAGER') == '1'
+
+# Async views run their queries on this many threads
+ASYNC_DB_WORKERS = int(environ.get('ASYNC_DB_WORKERS', 8))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -14,14 +14,20 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 from django.conf import settings
 
+from core.views import media, metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('user.urls')),
     path('updates/', include('updates.urls')),
     path('api/updates/', include('updates.api.urls')),
     path('api/recepie/', include('recepie.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('metrics', metrics_view, name='metrics'),
+]
+
+if settings.SERVE_MEDIA:
+    urlpatterns.append(re_path(
+        rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.*)$', media, name='media'))
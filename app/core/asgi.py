@@ -0,0 +1,33 @@
+"""ASGI handler fit for the sync streaming views of the project"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """Django's ASGI handler, streaming responses off the event loop
+
+    Django 3.2 iterates streaming content on the event loop, where the ORM
+    refuses to run, so streamed querysets failed. Their chunks are pulled on
+    the thread sync views run on instead.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        chunks = iter(response)
+        response.streaming_content = ()
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+
+        async def send_content(message):
+            # The closing message of the now empty content: send the chunks first
+            if message['type'] == 'http.response.body' and not message.get('more_body'):
+                chunk = await next_chunk(chunks, None)
+                while chunk is not None:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+                    chunk = await next_chunk(chunks, None)
+            await send(message)
+
+        await super().send_response(response, send_content)
@@ -0,0 +1,110 @@
+"""Helpers for the load benchmark commands"""
+
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(values, fraction):
+    """Return the value below which ``fraction`` of the sorted values fall"""
+
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def server_queries(server_timing):
+    """Return the query count of a ``Server-Timing`` header, if reported"""
+
+    match = SERVER_TIMING_QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+def fetch(url, headers=None, timeout=30):
+    """GET ``url``, return the status code, the seconds it took and the
+    ``Server-Timing`` header
+    """
+
+    request = urllib.request.Request(url, headers=headers or {})
+    start = time.perf_counter()
+    server_timing = None
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+            server_timing = response.headers.get('Server-Timing')
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - start, server_timing
+
+
+def run(send, targets, concurrency, on_exit=None):
+    """Call ``send(target)`` for every target from ``concurrency`` threads
+
+    ``send`` returns ``(status, seconds, server_timing)``; ``on_exit`` is
+    called by each thread once there is nothing left to send.
+    """
+
+    targets = iter(targets)
+    lock = threading.Lock()
+    results = []
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    target = next(targets, None)
+                if target is None:
+                    return
+                result = send(target)
+                with lock:
+                    results.append(result)
+        finally:
+            if on_exit is not None:
+                on_exit()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(results, time.perf_counter() - start, concurrency)
+
+
+def summarize(results, elapsed, concurrency):
+    """Throughput, errors, latency percentiles in ms and queries per request"""
+
+    latencies = sorted(seconds * 1000 for _, seconds, _ in results)
+    errors = sum(1 for status, _, _ in results if status is None or status >= 400)
+    queries = [count for count in (server_queries(timing) for _, _, timing in results)
+               if count is not None]
+    return {
+        'requests': len(results),
+        'concurrency': concurrency,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(results) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries_per_request': (round(sum(queries) / len(queries), 2)
+                                if queries else None),
+    }
+
+
+def run_load(urls, requests, concurrency, headers=None):
+    """GET ``requests`` urls (cycling through ``urls``) with ``concurrency``
+    clients in parallel
+    """
+
+    targets = [urls[i % len(urls)] for i in range(requests)]
+    return run(lambda url: fetch(url, headers), targets, concurrency)
@@ -0,0 +1,149 @@
+"""PostgreSQL backend with connection health checks and optional pooling
+
+Extra keys of the ``DATABASES`` entry:
+
+``CONN_HEALTH_CHECKS``
+    Check a persistent connection with ``SELECT 1`` before its first use in
+    a request, reconnecting when the server dropped it.
+``POOL``
+    ``{'MAX_SIZE': ..., 'TIMEOUT': ...}`` shares at most ``MAX_SIZE``
+    connections between the threads of a process; closing a connection
+    returns it to the pool. Acquiring one waits at most ``TIMEOUT`` seconds.
+    Pools are kept per connection parameters, so renaming the database (as
+    the test runner does) never hands out connections to the old one. Their
+    stats are exported through ``/metrics``.
+"""
+
+import threading
+
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core import metrics
+from core.db.pool import Pool, PoolTimeout
+
+
+# (alias, database name, connection params) to pool
+_pools = {}
+_pools_lock = threading.Lock()
+
+POOL_METRICS = (
+    ('size', 'gauge', 'Connections opened by the pool'),
+    ('idle', 'gauge', 'Connections waiting in the pool'),
+    ('in_use', 'gauge', 'Connections handed out by the pool'),
+    ('max_size', 'gauge', 'Connections the pool may open'),
+    ('max_wait_seconds', 'gauge', 'Longest wait for a connection'),
+    ('acquired', 'counter', 'Connections acquired from the pool'),
+    ('waits', 'counter', 'Acquisitions that waited for a connection'),
+    ('wait_seconds', 'counter', 'Time spent waiting for connections'),
+    ('timeouts', 'counter', 'Acquisitions that timed out'),
+)
+
+
+def _pool_stat(stat):
+    def collect():
+        with _pools_lock:
+            pools = list(_pools.items())
+        return [({'alias': alias, 'database': database}, pool.stats()[stat])
+                for (alias, database, _), pool in pools]
+    return collect
+
+
+for _stat, _kind, _help in POOL_METRICS:
+    metrics.registry.collector(
+        f'db_pool_{_stat}' + ('_total' if _kind == 'counter' else ''),
+        _help, _pool_stat(_stat), kind=_kind)
+
+
+def _is_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = self.settings_dict.get(
+            'CONN_HEALTH_CHECKS', False)
+        self.health_check_done = False
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options or not options.get('MAX_SIZE'):
+            return None
+        params = self.get_connection_params()
+        key = (self.alias, params.get('database'),
+               tuple(sorted((name, str(value)) for name, value in params.items())))
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = Pool(
+                    max_size=options['MAX_SIZE'],
+                    timeout=options.get('TIMEOUT', 30),
+                    check=_is_usable if self.health_check_enabled else None)
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            return pool.acquire(
+                lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        except PoolTimeout as exc:
+            raise OperationalError(str(exc)) from exc
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        # A connection closed inside atomic() stays referenced by the wrapper
+        if self.in_atomic_block or not self._reset(connection):
+            pool.discard(connection)
+        else:
+            pool.release(connection)
+
+    def _reset(self, connection):
+        """Roll back what's left of a transaction, False if that's impossible"""
+
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    def close_if_unusable_or_obsolete(self):
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def close_if_health_check_failed(self):
+        """Drop a persistent connection the server closed since last used"""
+
+        if (self.connection is None or not self.health_check_enabled
+                or self.health_check_done):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,121 @@
+"""A small thread safe pool of database connections"""
+
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the acquisition timeout"""
+
+
+class Pool:
+    """Hand out at most ``max_size`` connections made by ``factory``
+
+    Released connections are kept idle and handed out again. ``acquire``
+    waits up to ``timeout`` seconds for one when ``max_size`` are in use.
+    ``check``, when given, is called with an idle connection before it is
+    reused and should return False when the connection is broken.
+    """
+
+    def __init__(self, factory=None, max_size=10, timeout=30, check=None,
+                 close=None):
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check = check
+        self.close_connection = close or (lambda connection: connection.close())
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self.acquired = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def acquire(self, factory=None):
+        """Return an idle connection, or one made by ``factory``"""
+
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'No connection available within {self.timeout}s '
+                        f'({self.max_size} in use)')
+                waited = True
+                self._condition.wait(remaining)
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                self._size += 1
+            self._record_wait(waited, time.monotonic() - start)
+
+        if connection is not None:
+            if self.check is None or self.check(connection):
+                return connection
+            self._close(connection)
+        try:
+            return (factory or self.factory)()
+        except BaseException:
+            self._forget()
+            raise
+
+    def release(self, connection):
+        """Return a healthy connection to the pool"""
+
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a connection that must not be reused, freeing its slot"""
+
+        self._close(connection)
+        self._forget()
+
+    def clear(self):
+        """Close every idle connection"""
+
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'acquired': self.acquired,
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'max_wait_seconds': self.max_wait_seconds,
+                'timeouts': self.timeouts,
+            }
+
+    def _record_wait(self, waited, seconds):
+        self.acquired += 1
+        if waited:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def _forget(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _close(self, connection):
+        try:
+            self.close_connection(connection)
+        except Exception:
+            pass
@@ -0,0 +1,19 @@
+"""Log formatting"""
+
+import logging
+
+
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Append the ``extra`` fields of a record as ``key=value`` pairs"""
+
+    def format(self, record):
+        message = super().format(record)
+        fields = {key: value for key, value in vars(record).items()
+                  if key not in _RECORD_ATTRIBUTES}
+        if not fields:
+            return message
+        return message + ' ' + ' '.join(
+            f'{key}={value!r}' for key, value in sorted(fields.items()))
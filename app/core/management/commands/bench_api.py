@@ -0,0 +1,171 @@
+""" Command measuring the throughput & latency of the API """
+import json
+import os
+import subprocess
+import threading
+import time
+from dataclasses import asdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import benchmark, seeding
+from core.models import Recepie
+
+
+PREFIX = 'bench'
+
+
+def _endpoints():
+    """Name & path of every benchmarked endpoint, given a user's recepie id"""
+
+    return {
+        'recepie-list': lambda recepie_id: reverse('recepie:recepie-list'),
+        'recepie-detail': lambda recepie_id: reverse(
+            'recepie:recepie-detail', args=[recepie_id]),
+        'tag-list': lambda recepie_id: reverse('recepie:tag-list'),
+        'ingredient-list': lambda recepie_id: reverse('recepie:ingredient-list'),
+        'user-me': lambda recepie_id: reverse('user:me'),
+        'update-list': lambda recepie_id: '/api/updates/',
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _client_host():
+    """A host name the test client may use with the current ALLOWED_HOSTS"""
+
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+class Command(BaseCommand):
+    """ Django command benchmarking the recepie, user & updates APIs """
+
+    help = ('Seed a data set then request the API endpoints with concurrent '
+            'clients, reporting latency percentiles, requests/s & queries '
+            'per request as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=10, help='Per user')
+        parser.add_argument('--ingredients', type=int, default=20, help='Per user')
+        parser.add_argument('--recepies', type=int, default=50, help='Per user')
+        parser.add_argument('--updates', type=int, default=5, help='Per user')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--url',
+                            help='Base url of a running server, otherwise '
+                                 'requests go through the test client')
+        parser.add_argument('--output', help='Result file, defaults to '
+                                             'bench-results/<commit>-<time>.json')
+        parser.add_argument('--keep', action='store_true',
+                            help="Don't delete the seeded data afterwards")
+        parser.add_argument('--reuse', action='store_true',
+                            help='Benchmark the data kept by a previous --keep run')
+        parser.add_argument('--force', action='store_true',
+                            help='Allow deleting seeded users from a database '
+                                 'not created by the test runner')
+
+    def handle(self, *args, **options):
+        dataset = seeding.Dataset(
+            users=options['users'], tags=options['tags'],
+            ingredients=options['ingredients'], recepies=options['recepies'],
+            updates=options['updates'], prefix=PREFIX, seed=options['seed'])
+        if not (options['reuse'] and options['keep']):
+            try:
+                seeding.check_database(options['force'])
+            except seeding.UnsafeDatabase as exc:
+                raise CommandError(exc)
+        if not options['reuse']:
+            seeding.delete(PREFIX, force=options['force'])
+            seeding.seed(dataset, with_tokens=True)
+
+        try:
+            users = self._users()
+            if not users:
+                raise CommandError(
+                    'No benchmark users to reuse, seed them with --keep first')
+            results = {
+                name: self._measure(path, users, options)
+                for name, path in _endpoints().items()
+            }
+        finally:
+            if not options['keep']:
+                seeding.delete(PREFIX, force=options['force'])
+
+        report = {
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'target': options['url'] or 'test-client',
+            'dataset': asdict(dataset),
+            'endpoints': results,
+        }
+        output = options['output'] or os.path.join(
+            'bench-results', f'{report["commit"] or "unknown"}-{int(time.time())}.json')
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:>16}: {result["requests_per_second"]:>8} req/s  '
+                f'p50 {result["p50_ms"]} ms  p95 {result["p95_ms"]} ms  '
+                f'p99 {result["p99_ms"]} ms  '
+                f'{result["queries_per_request"]} queries/req  '
+                f'{result["errors"]} errors')
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+    def _users(self):
+        """Token & first recepie id of every benchmark user"""
+
+        tokens = dict(Token.objects.filter(
+            user__in=seeding.seeded_users(PREFIX)).values_list('user_id', 'key'))
+        recepies = {}
+        for recepie_id, user_id in Recepie.objects.filter(
+                user_id__in=tokens).order_by('-id').values_list('id', 'user_id'):
+            recepies[user_id] = recepie_id
+        return [(key, recepies.get(user_id)) for user_id, key in tokens.items()]
+
+    def _measure(self, path, users, options):
+        targets = [(path(recepie_id), token) for token, recepie_id in (
+            users[index % len(users)] for index in range(options['requests']))]
+        if options['url']:
+            base = options['url'].rstrip('/')
+            return benchmark.run(
+                lambda target: benchmark.fetch(
+                    base + target[0],
+                    {'Authorization': f'Token {target[1]}'}),
+                targets, options['concurrency'])
+
+        local = threading.local()
+        host = _client_host()
+
+        def send(target):
+            if not hasattr(local, 'client'):
+                local.client = APIClient(SERVER_NAME=host)
+            start = time.perf_counter()
+            response = local.client.get(
+                target[0], HTTP_AUTHORIZATION=f'Token {target[1]}')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return (response.status_code, time.perf_counter() - start,
+                    response.get('Server-Timing'))
+
+        return benchmark.run(send, targets, options['concurrency'],
+                             on_exit=connections.close_all)
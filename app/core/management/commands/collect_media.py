@@ -0,0 +1,54 @@
+""" Command to delete media files no model references """
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from core import media
+from core.models import MediaBlob
+
+
+class Command(BaseCommand):
+    """ Django command to garbage collect unreferenced media blobs """
+
+    help = 'Delete stored media files that are no longer referenced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute reference counts from the models first')
+        parser.add_argument('--grace', type=int, default=3600,
+                            help='Keep unreferenced files younger than this many seconds')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the files that would be deleted')
+
+    def handle(self, *args, **options):
+        prefix = getattr(default_storage, 'prefix', None)
+        if prefix is None:
+            raise CommandError('The default storage is not content addressed')
+
+        if options['recount']:
+            media.recount()
+
+        referenced = set(MediaBlob.objects.filter(
+            references__gt=0).values_list('name', flat=True))
+        cutoff = time.time() - options['grace']
+        deleted = 0
+        for name in self._stored_names(prefix):
+            if name in referenced:
+                continue
+            if default_storage.get_modified_time(name).timestamp() > cutoff:
+                continue
+            self.stdout.write(f'Deleting {name}')
+            if not options['dry_run']:
+                default_storage.delete(name)
+            deleted += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} files'))
+
+    def _stored_names(self, prefix):
+        directories, files = default_storage.listdir(prefix)
+        # Left behind by interrupted uploads
+        yield from (f'{prefix}/{name}' for name in files)
+        for directory in directories:
+            _, files = default_storage.listdir(f'{prefix}/{directory}')
+            yield from (f'{prefix}/{directory}/{name}' for name in files)
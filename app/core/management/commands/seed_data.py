@@ -0,0 +1,74 @@
+""" Command generating large data sets quickly """
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import seeding
+
+
+class Command(BaseCommand):
+    """ Django command bulk inserting reproducible fixture data """
+
+    help = ('Generate users, tags, ingredients, recepies (with their tag & '
+            'ingredient links) and updates in bulk, reporting rows/s')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=10, help='Per user')
+        parser.add_argument('--ingredients', type=int, default=20, help='Per user')
+        parser.add_argument('--recepies', type=int, default=100, help='Per user')
+        parser.add_argument('--tags-per-recepie', type=int, default=3)
+        parser.add_argument('--ingredients-per-recepie', type=int, default=5)
+        parser.add_argument('--updates', type=int, default=5, help='Per user')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='The same seed generates the same data')
+        parser.add_argument('--prefix', default='seed',
+                            help='Users are named <prefix>-<n>@example.com')
+        parser.add_argument('--batch-size', type=int, default=seeding.BATCH_SIZE)
+        parser.add_argument('--method', choices=('bulk', 'copy'), default=None,
+                            help='Insert with bulk_create or COPY, defaults to '
+                                 'COPY on PostgreSQL')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete the users of the prefix first')
+        parser.add_argument('--force', action='store_true',
+                            help='Allow deleting seeded users from a database '
+                                 'not created by the test runner')
+
+    def handle(self, *args, **options):
+        method = options['method'] or (
+            'copy' if connection.vendor == 'postgresql' else 'bulk')
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('COPY is only supported on PostgreSQL')
+
+        dataset = seeding.Dataset(
+            users=options['users'], tags=options['tags'],
+            ingredients=options['ingredients'], recepies=options['recepies'],
+            tags_per_recepie=options['tags_per_recepie'],
+            ingredients_per_recepie=options['ingredients_per_recepie'],
+            updates=options['updates'], prefix=options['prefix'],
+            seed=options['seed'])
+        if options['replace']:
+            try:
+                seeding.delete(dataset.prefix, force=options['force'])
+            except seeding.UnsafeDatabase as exc:
+                raise CommandError(exc)
+
+        start = time.perf_counter()
+
+        def progress(users, counts):
+            rows = sum(counts.values())
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{users}/{dataset.users} users, {rows} rows, '
+                              f'{rows / elapsed:.0f} rows/s')
+
+        counts = seeding.seed(dataset, method=method,
+                              batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - start
+
+        for model, rows in counts.items():
+            self.stdout.write(f'{model:>17}: {rows}')
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {total} rows in {elapsed:.1f}s with {method} '
+            f'({total / elapsed:.0f} rows/s)'))
@@ -0,0 +1,95 @@
+""" Command running the project on a multi worker production server """
+import multiprocessing
+import os
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from gunicorn.app.base import BaseApplication
+
+from user.authentication import token_cache
+
+
+def default_workers():
+    """Gunicorn's recommended 2 x cores + 1, unless WEB_CONCURRENCY is set"""
+
+    return int(os.environ.get(
+        'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+
+class ServerApplication(BaseApplication):
+    """Gunicorn application configured from the command options"""
+
+    def __init__(self, options, asgi=False):
+        self.options = options
+        self.asgi = asgi
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        # Imported in the workers so a reload (HUP) picks up new code
+        if self.asgi:
+            from app.asgi import application
+        else:
+            from app.wsgi import application
+        return application
+
+
+class Command(BaseCommand):
+    """ Django command serving the project with gunicorn """
+
+    help = ('Serve the project with gunicorn. Send HUP to reload the workers '
+            'gracefully, TERM to stop after in-flight requests finish.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:8000'))
+        parser.add_argument('--workers', type=int, default=default_workers())
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Threads per worker (sync workers only)')
+        parser.add_argument('--max-requests', type=int, default=1000,
+                            help='Recycle a worker after this many requests')
+        parser.add_argument('--max-requests-jitter', type=int, default=100,
+                            help='Randomise recycling so workers restart apart')
+        parser.add_argument('--timeout', type=int, default=30,
+                            help='Kill workers silent for this many seconds')
+        parser.add_argument('--graceful-timeout', type=int, default=30,
+                            help='Time given to in-flight requests on restart')
+        parser.add_argument('--keep-alive', type=int, default=5)
+        parser.add_argument('--asgi', action='store_true',
+                            help='Serve app.asgi with uvicorn workers')
+        parser.add_argument('--reload', action='store_true',
+                            help='Restart workers when the code changes')
+
+    def handle(self, *args, **options):
+        # Cache versions (see recepie.cache) must be seen by every worker
+        if options['workers'] > 1 and isinstance(caches['default'], LocMemCache):
+            raise CommandError(
+                'The default cache is local to each process, so workers would '
+                'serve each other\'s stale responses. Set CACHE_BACKEND & '
+                'CACHE_LOCATION to a shared cache (e.g. memcached) or run '
+                'with --workers 1')
+        # Workers forked from here reject tokens revoked by any of them
+        if options['workers'] > 1 and token_cache.shared_alias is None:
+            token_cache.shared_alias = 'default'
+
+        server_options = {
+            'bind': options['bind'],
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'max_requests': options['max_requests'],
+            'max_requests_jitter': options['max_requests_jitter'],
+            'timeout': options['timeout'],
+            'graceful_timeout': options['graceful_timeout'],
+            'keepalive': options['keep_alive'],
+            'reload': options['reload'],
+            'accesslog': '-',
+            'errorlog': '-',
+            'worker_tmp_dir': '/dev/shm' if os.path.isdir('/dev/shm') else None,
+        }
+        if options['asgi']:
+            server_options['worker_class'] = 'uvicorn.workers.UvicornWorker'
+        ServerApplication(server_options, asgi=options['asgi']).run()
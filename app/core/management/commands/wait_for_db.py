@@ -1,21 +1,64 @@
 """ Commands for connection to DB """
+import random
 import time
-from django.db import connections
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """ Django command to pause execution until DB is available """
 
+    help = 'Wait until the database accepts queries (and optionally is migrated)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Alias of the database to wait for')
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Give up after this many seconds')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Initial delay between attempts, doubled after each')
+        parser.add_argument('--max-interval', type=float, default=5,
+                            help='Longest delay between attempts')
+        parser.add_argument('--wait-for-migrations', action='store_true',
+                            help='Also wait until every migration is applied')
+
     def handle(self, *args, **options):
+        connection = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        delay = options['interval']
         self.stdout.write('Waiting for Database')
-        db_conn = None
-        while not db_conn:
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second')
-                time.sleep(1)   # Sleep for one sec
+                reason = self._check(connection, options['wait_for_migrations'])
+            except OperationalError as exc:
+                connection.close()
+                reason = f'Database unavailable ({str(exc).strip()})'
+            if reason is None:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CommandError(
+                    f'{reason}, gave up after {options["timeout"]} seconds')
+            # Jitter spreads out the retries of containers started together
+            sleep = min(delay * random.uniform(0.5, 1), remaining)
+            self.stdout.write(f'{reason}, waiting {sleep:.1f} seconds')
+            time.sleep(sleep)
+            delay = min(delay * 2, options['max_interval'])
 
         self.stdout.write(self.style.SUCCESS("Database Available!"))
+
+    def _check(self, connection, wait_for_migrations):
+        """Return why the database isn't ready yet, None when it is"""
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if wait_for_migrations:
+            executor = MigrationExecutor(connection)
+            plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+            if plan:
+                return f'{len(plan)} migrations not applied'
+        return None
@@ -0,0 +1,86 @@
+"""Reference counting of stored media files"""
+
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import MediaBlob
+
+
+_tracked = []
+
+
+def retain(names):
+    """Add a reference to each of the named files"""
+
+    for name in set(names):
+        blobs = MediaBlob.objects.filter(name=name)
+        if blobs.update(references=F('references') + 1):
+            continue
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, references=1)
+        except IntegrityError:
+            blobs.update(references=F('references') + 1)
+
+
+def release(names):
+    """Drop a reference to each of the named files"""
+
+    MediaBlob.objects.filter(name__in=set(names)).update(
+        references=F('references') - 1)
+
+
+def track(model, get_names):
+    """Count the files referenced by instances of ``model``
+
+    ``get_names(instance)`` returns the names of the files used by an instance.
+    """
+
+    def names_of(instance):
+        return {name for name in get_names(instance) if name}
+
+    def before_save(sender, instance, raw=False, **kwargs):
+        instance._media_names = set()
+        if instance.pk and not raw:
+            previous = sender._default_manager.filter(pk=instance.pk).first()
+            if previous is not None:
+                instance._media_names = names_of(previous)
+
+    def after_save(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        before, after = getattr(instance, '_media_names', set()), names_of(instance)
+        retain(after - before)
+        release(before - after)
+        instance._media_names = after
+
+    def after_delete(sender, instance, **kwargs):
+        release(names_of(instance))
+
+    _tracked.append((model, names_of))
+    uid = f'media:{model._meta.label}'
+    pre_save.connect(before_save, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(after_save, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(after_delete, sender=model, weak=False, dispatch_uid=uid)
+
+
+def recount():
+    """Recompute every reference count from the tracked models"""
+
+    counts = Counter()
+    for model, names_of in _tracked:
+        for instance in model._default_manager.iterator():
+            counts.update(names_of(instance))
+
+    with transaction.atomic():
+        MediaBlob.objects.update(references=0)
+        existing = set(MediaBlob.objects.values_list('name', flat=True))
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name, references=count)
+             for name, count in counts.items() if name not in existing])
+        for name, count in counts.items():
+            if name in existing:
+                MediaBlob.objects.filter(name=name).update(references=count)
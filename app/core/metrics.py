@@ -0,0 +1,170 @@
+"""In-process histograms rendered in the Prometheus text format
+
+Every process (e.g. each gunicorn worker) keeps its own store, so a scrape
+of ``/metrics`` reports the worker that answered it. Other modules may add
+counters & gauges read when rendering, see ``Registry.collector``.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    """Cumulative histogram of observed values"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """Histograms by name & labels, and collected counters & gauges"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._help = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text, buckets):
+        self._help[name] = (help_text, buckets)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(
+                    self._help[name][1])
+            histogram.observe(value)
+
+    def collector(self, name, help_text, collect, kind='gauge'):
+        """Render ``collect()``, an iterable of ``(labels, value)``, as ``name``"""
+
+        self._collectors[name] = (help_text, kind, collect)
+
+    def get(self, name, **labels):
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Return every histogram in the Prometheus text exposition format"""
+
+        with self._lock:
+            items = sorted(self._histograms.items())
+            lines, described = [], set()
+            for (name, labels), histogram in items:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f'# HELP {name} {self._help[name][0]}')
+                    lines.append(f'# TYPE {name} histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+                lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {histogram.count}')
+                lines.append(f'{name}_sum{_labels(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+
+        for name, (help_text, kind, collect) in sorted(self._collectors.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in collect():
+                lines.append(f'{name}{_labels(sorted(labels.items()))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"')
+               for _, value in pairs)
+    return '{' + ','.join(
+        f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+registry = Registry()
+registry.describe('http_request_duration_seconds',
+                  'Time spent handling requests', LATENCY_BUCKETS)
+registry.describe('http_request_db_queries',
+                  'Database queries run per request', COUNT_BUCKETS)
+registry.describe('http_request_db_duration_seconds',
+                  'Time spent in database queries per request', LATENCY_BUCKETS)
+registry.describe('http_request_serializer_duration_seconds',
+                  'Time spent serializing per request', LATENCY_BUCKETS)
+registry.describe('http_response_size_bytes',
+                  'Size of response bodies', SIZE_BUCKETS)
+
+
+class Timings:
+    """Durations accumulated by stage during one request"""
+
+    def __init__(self):
+        self.durations = {}
+        self._depth = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+
+_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def start_request():
+    """Collect ``timed`` durations of the current request"""
+
+    timings = Timings()
+    return timings, _timings.set(timings)
+
+
+def end_request(token):
+    _timings.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name``
+
+    Nested blocks with the same name are only counted once.
+    """
+
+    timings = _timings.get()
+    if timings is None or timings._depth.get(name):
+        yield
+        return
+    timings._depth[name] = 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._depth[name] = 0
+        timings.add(name, time.perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """Count the time serializers spend rendering objects"""
+
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
@@ -0,0 +1,185 @@
+"""Per request performance instrumentation"""
+
+import asyncio
+import contextvars
+import logging
+import time
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.dispatch import receiver
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """``execute_wrapper`` counting & timing queries, keeping the first few"""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.seconds += duration
+            if len(self.queries) < self.keep:
+                self.queries.append((sql, duration))
+
+
+_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+def _dispatch(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def record_queries():
+    """Count the queries of this thread's connections for the current request
+
+    The request is found through the context, which ``sync_to_async`` carries
+    over: threads running a request's queries call this (once is enough) so
+    they show up in the request's metrics.
+    """
+
+    for connection in connections.all():
+        if _dispatch not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_dispatch)
+
+
+@receiver(request_started)
+def _record_request_queries(sender, **kwargs):
+    # Sent on the thread the sync views of the request run on, ASGI included
+    record_queries()
+
+
+class PerformanceMiddleware:
+    """Record latency, queries, serializer time & response size of each view
+
+    The measures feed ``core.metrics.registry``, are returned in a
+    ``Server-Timing`` header and requests slower than
+    ``SLOW_REQUEST_SECONDS`` are logged with their SQL.
+
+    Streaming responses are measured once their content is consumed, the
+    header only covers the work done before the first chunk.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = asyncio.iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        measure = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self._stop(measure)
+        return self._finish(request, response, measure)
+
+    async def __acall__(self, request):
+        measure = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._stop(measure)
+        return self._finish(request, response, measure)
+
+    def _start(self):
+        recorder = QueryRecorder(settings.SLOW_REQUEST_LOGGED_QUERIES)
+        timings, token = metrics.start_request()
+        return {'recorder': recorder, 'timings': timings, 'token': token,
+                'recorder_token': _recorder.set(recorder),
+                'start': time.perf_counter()}
+
+    def _stop(self, measure):
+        _recorder.reset(measure['recorder_token'])
+        metrics.end_request(measure['token'])
+        measure['duration'] = time.perf_counter() - measure['start']
+
+    def _finish(self, request, response, measure):
+        recorder = measure['recorder']
+        duration = measure['duration']
+        serializer_seconds = measure['timings'].durations.get('serializer', 0.0)
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={recorder.seconds * 1000:.2f};desc="{recorder.count} queries"',
+                f'serializer;dur={serializer_seconds * 1000:.2f}',
+                f'total;dur={duration * 1000:.2f}',
+            ))
+
+        if response.streaming:
+            response.streaming_content = self._stream(
+                request, response, measure, response.streaming_content)
+        else:
+            self._observe(request, response, measure, len(response.content))
+        return response
+
+    def _stream(self, request, response, measure, content):
+        # The content is consumed after the middleware returned, by the server
+        recorder, iterator, size = measure['recorder'], iter(content), 0
+        start = time.perf_counter()
+        try:
+            while True:
+                token = _recorder.set(recorder)
+                try:
+                    record_queries()
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    _recorder.reset(token)
+                size += len(chunk)
+                yield chunk
+        finally:
+            measure['duration'] += time.perf_counter() - start
+            self._observe(request, response, measure, size)
+
+    def _observe(self, request, response, measure, size):
+        recorder = measure['recorder']
+        duration = measure['duration']
+        serializer_seconds = measure['timings'].durations.get('serializer', 0.0)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+
+        labels = {'view': view, 'method': request.method}
+        metrics.registry.observe('http_request_duration_seconds', duration, **labels)
+        metrics.registry.observe('http_request_db_queries', recorder.count, **labels)
+        metrics.registry.observe(
+            'http_request_db_duration_seconds', recorder.seconds, **labels)
+        metrics.registry.observe(
+            'http_request_serializer_duration_seconds', serializer_seconds, **labels)
+        metrics.registry.observe('http_response_size_bytes', size, **labels)
+
+        if duration >= settings.SLOW_REQUEST_SECONDS:
+            logger.warning('Slow request', extra={
+                'view': view,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'queries': recorder.count,
+                'db_ms': round(recorder.seconds * 1000, 2),
+                'serializer_ms': round(serializer_seconds * 1000, 2),
+                'sql': [f'{seconds * 1000:.2f}ms {sql}'
+                        for sql, seconds in recorder.queries],
+            })
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recepie_image'),
+    ]
+
+    operations = [
+        # The through tables already exist, only the migration state changes
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecepieTag',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False)),
+                        ('recepie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recepie')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tag')),
+                    ],
+                    options={
+                        'db_table': 'core_recepie_tags',
+                        'unique_together': {('recepie', 'tag')},
+                    },
+                ),
+                migrations.CreateModel(
+                    name='RecepieIngredient',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False)),
+                        ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ingredient')),
+                        ('recepie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recepie')),
+                    ],
+                    options={
+                        'db_table': 'core_recepie_ingredients',
+                        'unique_together': {('recepie', 'ingredient')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recepie',
+                    name='tags',
+                    field=models.ManyToManyField(through='core.RecepieTag', to='core.Tag'),
+                ),
+                migrations.AlterField(
+                    model_name='recepie',
+                    name='ingredients',
+                    field=models.ManyToManyField(through='core.RecepieIngredient', to='core.Ingredient'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recepietag',
+            index=models.Index(fields=['tag', 'recepie'], name='recepie_tag_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recepieingredient',
+            index=models.Index(fields=['ingredient', 'recepie'], name='recepie_ingredient_lookup_idx'),
+        ),
+    ]
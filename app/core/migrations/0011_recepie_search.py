@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+def fill_search_text(apps, schema_editor):
+    Recepie = apps.get_model('core', 'Recepie')
+    RecepieTag = apps.get_model('core', 'RecepieTag')
+    RecepieIngredient = apps.get_model('core', 'RecepieIngredient')
+
+    names = {}
+    for through, column in ((RecepieTag, 'tag__name'),
+                            (RecepieIngredient, 'ingredient__name')):
+        for recepie_id, name in through.objects.values_list('recepie_id', column):
+            names.setdefault(recepie_id, []).append(name)
+    Recepie.objects.bulk_update(
+        [Recepie(id=recepie_id, search_text=' '.join(sorted(values)))
+         for recepie_id, values in names.items()],
+        ['search_text'], batch_size=500)
+
+
+POSTGRES_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """ALTER TABLE core_recepie ADD COLUMN search_vector tsvector
+       GENERATED ALWAYS AS (
+           setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+           setweight(to_tsvector('simple', coalesce(search_text, '')), 'B')
+       ) STORED""",
+    'CREATE INDEX recepie_search_vector_idx ON core_recepie USING gin (search_vector)',
+    """CREATE INDEX recepie_search_trgm_idx ON core_recepie
+       USING gin ((title || ' ' || search_text) gin_trgm_ops)""",
+]
+
+
+def add_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recepie_search_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS recepie_search_vector_idx')
+    schema_editor.execute('ALTER TABLE core_recepie DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recepie',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(add_postgres_indexes, drop_postgres_indexes),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+MINUTES_BUCKETS = (0, 15, 30, 60, 120)
+
+
+def fill_stats(apps, schema_editor):
+    Recepie = apps.get_model('core', 'Recepie')
+    RecepieStat = apps.get_model('core', 'RecepieStat')
+    RecepieTag = apps.get_model('core', 'RecepieTag')
+    RecepieIngredient = apps.get_model('core', 'RecepieIngredient')
+
+    stats = {}
+
+    def add(user_id, kind, value, total=0):
+        count, previous = stats.get((user_id, kind, value), (0, 0))
+        stats[user_id, kind, value] = (count + 1, previous + total)
+
+    for user_id, price, minutes in Recepie.objects.values_list(
+            'user_id', 'price', 'minutes_to_deliver').iterator():
+        add(user_id, 'recepies', 0, price)
+        bucket = max(lower for lower in MINUTES_BUCKETS if lower <= minutes)
+        add(user_id, 'minutes', bucket, minutes)
+    for through, kind, column in ((RecepieTag, 'tag', 'tag_id'),
+                                  (RecepieIngredient, 'ingredient', 'ingredient_id')):
+        for user_id, related_id in through.objects.values_list(
+                'recepie__user_id', column).iterator():
+            add(user_id, kind, related_id)
+
+    RecepieStat.objects.bulk_create(
+        [RecepieStat(user_id=user_id, kind=kind, value=value,
+                     count=count, total=total)
+         for (user_id, kind, value), (count, total) in stats.items()],
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recepie_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecepieStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16)),
+                ('value', models.IntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'kind', 'value')},
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
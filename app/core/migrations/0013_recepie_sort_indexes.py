@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recepiestat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recepie',
+            index=models.Index(fields=['user', 'price', 'id'], name='recepie_user_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recepie',
+            index=models.Index(fields=['user', 'minutes_to_deliver', 'id'], name='recepie_user_minutes_idx'),
+        ),
+    ]
@@ -1,17 +1,21 @@
+import logging
 import os
 import uuid
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager,
                                         PermissionsMixin)
 
 
+logger = logging.getLogger(__name__)
+
+
 def recepie_image_file_path(instance, filename):
     """Generating file path for new recepie Image"""
 
     extension = filename.split('.')[-1]
     filename = f'{uuid.uuid4()}.{extension}'
-    print(f'File name:{filename}')
+    logger.debug('Recepie image named', extra={'image_name': filename})
     return os.path.join('upload/recepie/', filename)
 
 
@@ -62,6 +66,7 @@ class Tag(models.Model):
     name = models.CharField(max_length=32)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.name
@@ -73,11 +78,60 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=32)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.name
 
 
+class RecepieQuerySet(models.QuerySet):
+    """QuerySet to load the relations each recepie representation needs"""
+
+    def with_related_ids(self, relations=('tags', 'ingredients')):
+        """Prefetch only the ids of tags & ingredients, in order"""
+
+        models_by_name = {'tags': Tag, 'ingredients': Ingredient}
+        return self.prefetch_related(*[
+            models.Prefetch(name, queryset=models_by_name[name].objects.only(
+                'id').order_by('id'))
+            for name in relations])
+
+    def with_related_objects(self, relations=('tags', 'ingredients')):
+        """Prefetch complete tag & ingredient objects"""
+
+        return self.prefetch_related(*relations)
+
+    def with_tags(self, tag_ids, match_all=False):
+        """Filter recepies having any (or all) of the given tags"""
+
+        return self._filter_related(RecepieTag, 'tag_id', tag_ids, match_all)
+
+    def with_ingredients(self, ingredient_ids, match_all=False):
+        """Filter recepies having any (or all) of the given ingredients"""
+
+        return self._filter_related(RecepieIngredient, 'ingredient_id',
+                                    ingredient_ids, match_all)
+
+    def _filter_related(self, through, field_name, ids, match_all):
+        """Filter with EXISTS subqueries so rows never need DISTINCT"""
+
+        related = through.objects.filter(recepie=models.OuterRef('pk'))
+        if not match_all:
+            return self.filter(models.Exists(
+                related.filter(**{f'{field_name}__in': ids})))
+
+        queryset = self
+        for related_id in set(ids):
+            queryset = queryset.filter(models.Exists(
+                related.filter(**{field_name: related_id})))
+        return queryset
+
+
+class RecepieManager(models.Manager):
+    def get_queryset(self):
+        return RecepieQuerySet(self.model, using=self._db)
+
+
 class Recepie(models.Model):
     """Recepie model"""
 
@@ -86,9 +140,91 @@ class Recepie(models.Model):
     minutes_to_deliver = models.PositiveSmallIntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=32, blank=True)
-    ingredients = models.ManyToManyField('Ingredient')
-    tags = models.ManyToManyField('Tag')
+    ingredients = models.ManyToManyField('Ingredient',
+                                         through='RecepieIngredient')
+    tags = models.ManyToManyField('Tag', through='RecepieTag')
     image = models.ImageField(null=True, upload_to=recepie_image_file_path)
+    image_variants = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Names of the tags & ingredients, see recepie.search
+    search_text = models.TextField(blank=True, default='', editable=False)
+
+    objects = RecepieManager()
+
+    class Meta:
+        # Range filters & keyset pagination on the sortable fields
+        indexes = [
+            models.Index(fields=['user', 'price', 'id'],
+                         name='recepie_user_price_idx'),
+            models.Index(fields=['user', 'minutes_to_deliver', 'id'],
+                         name='recepie_user_minutes_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The stats signals lock the row until the new values are counted
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         return self.title
+
+
+class RecepieTag(models.Model):
+    """Tags assigned to a recepie"""
+
+    # Matches the integer key of the table Django created for the
+    # original auto generated through model
+    id = models.AutoField(primary_key=True)
+    recepie = models.ForeignKey(Recepie, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_recepie_tags'
+        unique_together = (('recepie', 'tag'),)
+        indexes = [
+            models.Index(fields=['tag', 'recepie'],
+                         name='recepie_tag_lookup_idx'),
+        ]
+
+
+class RecepieIngredient(models.Model):
+    """Ingredients assigned to a recepie"""
+
+    id = models.AutoField(primary_key=True)
+    recepie = models.ForeignKey(Recepie, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_recepie_ingredients'
+        unique_together = (('recepie', 'ingredient'),)
+        indexes = [
+            models.Index(fields=['ingredient', 'recepie'],
+                         name='recepie_ingredient_lookup_idx'),
+        ]
+
+
+class RecepieStat(models.Model):
+    """A running aggregate of a user's recepies, see recepie.stats"""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=16)
+    value = models.IntegerField(default=0)
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = (('user', 'kind', 'value'),)
+
+    def __str__(self) -> str:
+        return f'{self.kind}:{self.value}'
+
+
+class MediaBlob(models.Model):
+    """A stored file & how many model fields reference it"""
+
+    name = models.CharField(max_length=255, unique=True)
+    references = models.IntegerField(default=0)
+
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,215 @@
+"""Generate large, reproducible data sets for benchmarks
+
+Rows are inserted a chunk of users at a time, with ``bulk_create`` or (on
+Postgres) ``COPY``, so memory use doesn't depend on the size of the data
+set, and every password is the same precomputed hash instead of one PBKDF2
+run per user. The inserts send no signals, so the search text & stats of
+the seeded recepies are computed once their relations exist.
+"""
+
+import functools
+import io
+import random
+import re
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.backends.base.creation import TEST_DATABASE_PREFIX
+from rest_framework.authtoken.models import Token
+
+from core.models import Ingredient, Recepie, RecepieIngredient, RecepieTag, Tag
+from recepie import search, stats
+from updates.models import UpdateModel
+
+
+PASSWORD = 'seed-password'
+BATCH_SIZE = 1000
+
+WORDS = ('spicy', 'sweet', 'vegan', 'quick', 'baked', 'grilled', 'fresh',
+         'creamy', 'smoky', 'crispy', 'rice', 'chicken', 'lentil', 'tomato',
+         'garlic', 'lemon', 'basil', 'paneer', 'noodle', 'mango')
+
+
+@dataclass
+class Dataset:
+    """How many rows to generate, per user unless stated otherwise"""
+
+    users: int = 10
+    tags: int = 10
+    ingredients: int = 20
+    recepies: int = 50
+    tags_per_recepie: int = 3
+    ingredients_per_recepie: int = 5
+    updates: int = 5
+    prefix: str = 'seed'
+    seed: int = 0
+
+
+def user_email(dataset, index):
+    return f'{dataset.prefix}-{index}@example.com'
+
+
+class UnsafeDatabase(Exception):
+    """Raised when deleting seeded data outside a test database"""
+
+
+def is_test_database():
+    """Whether the default connection uses a database made by the test runner"""
+
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        return True
+    name = str(connection.settings_dict['NAME'])
+    return name.startswith(TEST_DATABASE_PREFIX) or (
+        name == connection.settings_dict.get('TEST', {}).get('NAME'))
+
+
+def check_database(force=False):
+    """Raise ``UnsafeDatabase`` unless seeded data may be deleted"""
+
+    if not force and not is_test_database():
+        raise UnsafeDatabase(
+            f'{connection.settings_dict["NAME"]} is not a test database, '
+            f'pass --force to delete seeded users from it')
+
+
+def seeded_users(prefix):
+    """The users seeded with ``prefix``, matching their exact email pattern"""
+
+    return get_user_model().objects.filter(
+        email__regex=rf'^{re.escape(prefix)}-[0-9]+@example\.com$')
+
+
+def delete(prefix, force=False):
+    """Delete the users (and with them every row) seeded with ``prefix``"""
+
+    check_database(force)
+    seeded_users(prefix).delete()
+
+
+def seed(dataset, with_tokens=False, method='bulk', batch_size=BATCH_SIZE,
+         progress=None):
+    """Insert the data set, return the number of rows inserted by model
+
+    ``method`` is ``'bulk'`` (``bulk_create``) or ``'copy'`` (Postgres
+    ``COPY``). ``progress``, when given, is called with the number of users
+    and the row counts so far after every chunk.
+    """
+
+    if method == 'copy' and connection.vendor != 'postgresql':
+        raise ValueError('COPY is only supported on PostgreSQL')
+    insert = functools.partial(
+        _copy if method == 'copy' else _insert, batch_size=batch_size)
+
+    rng = random.Random(dataset.seed)
+    password = make_password(PASSWORD)
+    counts = {}
+    users_per_chunk = max(1, batch_size // max(1, dataset.recepies))
+    for start in range(0, dataset.users, users_per_chunk):
+        indexes = range(start, min(start + users_per_chunk, dataset.users))
+        with transaction.atomic():
+            for model, rows in _seed_users(dataset, indexes, password, rng,
+                                           with_tokens, insert):
+                counts[model.__name__] = counts.get(model.__name__, 0) + rows
+        if progress is not None:
+            progress(indexes.stop, counts)
+    return counts
+
+
+def _insert(model, objects, batch_size):
+    model.objects.bulk_create(objects, batch_size=batch_size)
+    return model, len(objects)
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _copy(model, objects, batch_size):
+    """Insert the objects with ``COPY``, ``batch_size`` rows per statement"""
+
+    fields = [field for field in model._meta.concrete_fields
+              if field is not model._meta.auto_field]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    sql = f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN'
+    with connection.cursor() as cursor:
+        for start in range(0, len(objects), batch_size):
+            buffer = io.StringIO()
+            for obj in objects[start:start + batch_size]:
+                buffer.write('\t'.join(
+                    _copy_value(field.get_prep_value(field.pre_save(obj, True)))
+                    for field in fields))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+    return model, len(objects)
+
+
+def _ids_by_user(model, user_ids):
+    """Ids of the rows of each user, in insertion order
+
+    Read back because not every database returns the ids of bulk inserts.
+    """
+
+    ids = {user_id: [] for user_id in user_ids}
+    rows = model.objects.filter(user_id__in=user_ids).order_by('id')
+    for pk, user_id in rows.values_list('id', 'user_id'):
+        ids[user_id].append(pk)
+    return ids
+
+
+def _words(rng, count, limit):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))[:limit]
+
+
+def _seed_users(dataset, indexes, password, rng, with_tokens, insert):
+    User = get_user_model()
+    emails = [user_email(dataset, index) for index in indexes]
+    yield insert(User, [User(email=email, name=email.split('@')[0],
+                              password=password) for email in emails])
+    user_ids = list(User.objects.filter(email__in=emails).order_by('id')
+                    .values_list('id', flat=True))
+
+    if with_tokens:
+        yield insert(Token, [Token(user_id=user_id, key=Token.generate_key())
+                              for user_id in user_ids])
+
+    for model, count in ((Tag, dataset.tags), (Ingredient, dataset.ingredients)):
+        yield insert(model, [
+            model(user_id=user_id, name=f'{_words(rng, 1, 24)} {index}')
+            for user_id in user_ids for index in range(count)])
+    tags = _ids_by_user(Tag, user_ids)
+    ingredients = _ids_by_user(Ingredient, user_ids)
+
+    yield insert(Recepie, [
+        Recepie(user_id=user_id, title=_words(rng, 3, 32),
+                minutes_to_deliver=rng.randint(5, 240),
+                price=f'{rng.uniform(1, 999):.2f}')
+        for user_id in user_ids for _ in range(dataset.recepies)])
+    recepies = _ids_by_user(Recepie, user_ids)
+
+    tag_rows, ingredient_rows = [], []
+    for user_id in user_ids:
+        for recepie_id in recepies[user_id]:
+            tag_rows.extend(
+                RecepieTag(recepie_id=recepie_id, tag_id=tag_id)
+                for tag_id in rng.sample(
+                    tags[user_id], min(dataset.tags_per_recepie, len(tags[user_id]))))
+            ingredient_rows.extend(
+                RecepieIngredient(recepie_id=recepie_id, ingredient_id=ingredient_id)
+                for ingredient_id in rng.sample(
+                    ingredients[user_id],
+                    min(dataset.ingredients_per_recepie, len(ingredients[user_id]))))
+    yield insert(RecepieTag, tag_rows)
+    yield insert(RecepieIngredient, ingredient_rows)
+    search.refresh(pk for ids in recepies.values() for pk in ids)
+    for user_id in user_ids:
+        stats.rebuild(user_id)
+
+    yield insert(UpdateModel, [
+        UpdateModel(user_id=user_id, content=_words(rng, 6, 128))
+        for user_id in user_ids for _ in range(dataset.updates)])
@@ -0,0 +1,63 @@
+"""Content addressed media storage"""
+
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Store every distinct file once, named after the SHA-256 of its content
+
+    Files are saved as ``blobs/<2 hex>/<sha256><ext>`` whatever name they were
+    uploaded with, so saving identical content twice writes it once and every
+    name is immutable. Files referenced by models (see ``core.media``) are
+    never deleted, unreferenced ones are removed by ``collect_media``.
+    """
+
+    prefix = 'blobs'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name only depends on the content, see _save
+        return name
+
+    def _save(self, name, content):
+        directory = self.path(self.prefix)
+        os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            extension = os.path.splitext(name)[1].lower()
+            blob_name = f'{self.prefix}/{hexdigest[:2]}/{hexdigest}{extension}'
+            blob_path = self.path(blob_name)
+            if os.path.exists(blob_path):
+                os.remove(temp_path)
+                # Restart the grace period collect_media gives new files
+                os.utime(blob_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, blob_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return blob_name
+
+    def delete(self, name):
+        """Delete a file unless a model still references it"""
+
+        from core.models import MediaBlob
+
+        if MediaBlob.objects.filter(name=name, references__gt=0).exists():
+            return
+        super().delete(name)
+        MediaBlob.objects.filter(name=name).delete()
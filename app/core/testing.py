@@ -0,0 +1,133 @@
+"""Test helpers keeping the queries of endpoints in check & serving the
+ASGI application
+"""
+
+import functools
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .asgi import ASGIHandler
+
+
+def _format_queries(queries):
+    return '\n'.join(f'{index}. {query["sql"]}'
+                     for index, query in enumerate(queries, start=1))
+
+
+class QueryBudgetMixin:
+    """``TestCase`` mixin asserting how many queries endpoints run"""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        """Fail, listing the SQL, when the block runs more than ``budget``
+        queries
+        """
+
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            self.fail(f'{len(context)} queries run, the budget is {budget}:\n'
+                      f'{_format_queries(context.captured_queries)}')
+
+    def assertQueriesDontScale(self, grow, request, sizes=(10, 100),
+                               using=DEFAULT_DB_ALIAS):
+        """Fail when ``request()`` runs more queries as the data grows
+
+        ``grow(count)`` is called before each request to bring the data set
+        to ``count`` rows.
+        """
+
+        runs = []
+        for size in sizes:
+            grow(size)
+            with CaptureQueriesContext(connections[using]) as context:
+                request()
+            runs.append((size, context.captured_queries))
+
+        (small, baseline), *rest = runs
+        for size, queries in rest:
+            if len(queries) != len(baseline):
+                self.fail(
+                    f'{len(baseline)} queries with {small} rows but '
+                    f'{len(queries)} with {size}:\n{_format_queries(queries)}')
+
+
+def query_budget(budget, using=DEFAULT_DB_ALIAS):
+    """Fail the decorated test when a request of ``self.client`` runs more
+    than ``budget`` queries. The test case needs ``QueryBudgetMixin``.
+    """
+
+    def decorator(test):
+        @functools.wraps(test)
+        def wrapper(self, *args, **kwargs):
+            client = self.client
+            original = client.request
+
+            def request(**request_kwargs):
+                with self.assertMaxQueries(budget, using):
+                    return original(**request_kwargs)
+
+            client.request = request
+            try:
+                return test(self, *args, **kwargs)
+            finally:
+                del client.request
+        return wrapper
+    return decorator
+
+
+def asgi_application():
+    """Return the ASGI application as ``app.asgi`` builds it"""
+
+    with override_settings(MIDDLEWARE=settings.ASGI_MIDDLEWARE):
+        return ASGIHandler()
+
+
+async def asgi_get(application, path, query_string=''):
+    """GET ``path`` from ``application``, return the status & the body"""
+
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    await application({
+        'type': 'http', 'method': 'GET', 'path': path, 'headers': [],
+        'query_string': query_string.encode(), 'scheme': 'http',
+        'server': ('testserver', 80)}, receive, send)
+    return (messages[0]['status'],
+            b''.join(message.get('body', b'') for message in messages[1:]))
+
+
+@contextmanager
+def asgi_live_server(application):
+    """Serve ``application`` with uvicorn on a free port, yield its url"""
+
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        application, host='127.0.0.1', port=port, lifespan='off',
+        log_level='warning', access_log=False))
+    # Only the main thread may install signal handlers
+    server.install_signal_handlers = lambda: None
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.should_exit = True
+        thread.join()
@@ -0,0 +1,163 @@
+"""Test cases for the API benchmark & data seeding"""
+
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+
+from core import seeding
+from core.benchmark import server_queries
+from core.models import Recepie, RecepieTag, Tag
+from recepie import stats
+from updates.models import UpdateModel
+
+
+class SeedingTests(TransactionTestCase):
+    """Test generating data sets"""
+
+    def test_seed_counts(self):
+        """Test every model gets the requested rows"""
+
+        dataset = seeding.Dataset(users=3, tags=4, ingredients=5, recepies=6,
+                                  tags_per_recepie=2, updates=1)
+
+        counts = seeding.seed(dataset)
+
+        self.assertEqual(counts['User'], 3)
+        self.assertEqual(Tag.objects.count(), 12)
+        self.assertEqual(Recepie.objects.count(), 18)
+        self.assertEqual(RecepieTag.objects.count(), 36)
+        self.assertEqual(UpdateModel.objects.count(), 3)
+        user = get_user_model().objects.get(email=seeding.user_email(dataset, 0))
+        self.assertTrue(user.check_password(seeding.PASSWORD))
+
+    def test_seed_builds_stats_and_search_text(self):
+        """Test seeded recepies are counted & searchable like created ones"""
+
+        dataset = seeding.Dataset(users=2, tags=3, ingredients=3, recepies=4)
+
+        seeding.seed(dataset)
+
+        self.assertFalse(Recepie.objects.filter(search_text='').exists())
+        for user in get_user_model().objects.all():
+            self.assertEqual(stats.summary(user.pk)['recepies'], 4)
+            self.assertEqual(stats.check(user.pk), [])
+
+    def test_seed_is_deterministic(self):
+        """Test the same seed generates the same data"""
+
+        dataset = seeding.Dataset(users=2, recepies=3)
+
+        seeding.seed(dataset)
+        first = list(Recepie.objects.order_by('id').values_list('title', 'price'))
+        seeding.delete(dataset.prefix)
+        seeding.seed(dataset)
+        second = list(Recepie.objects.order_by('id').values_list('title', 'price'))
+
+        self.assertEqual(first, second)
+
+    def test_delete_matches_seeded_emails_only(self):
+        """Test users merely sharing the prefix are kept"""
+
+        seeding.seed(seeding.Dataset(users=2, recepies=1))
+        for email in ('seed-admin@example.com', 'seed-1@example.org',
+                      'seed-1@example.com.evil'):
+            get_user_model().objects.create_user(email=email, password='pass12345')
+
+        seeding.delete('seed')
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+
+    def test_delete_refused_outside_test_database(self):
+        """Test deleting needs force unless the test runner made the database"""
+
+        seeding.seed(seeding.Dataset(users=1, recepies=1))
+
+        with mock.patch.object(seeding, 'is_test_database', return_value=False):
+            with self.assertRaises(seeding.UnsafeDatabase):
+                seeding.delete('seed')
+            self.assertEqual(get_user_model().objects.count(), 1)
+            with self.assertRaises(CommandError):
+                call_command('seed_data', users=1, replace=True, stdout=StringIO())
+
+            seeding.delete('seed', force=True)
+
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class SeedDataCommandTests(TransactionTestCase):
+    """Test the seed_data command"""
+
+    def test_seed_data_reports_rows(self):
+        """Test the command inserts the data set in batches"""
+
+        out = StringIO()
+        call_command('seed_data', users=5, recepies=4, tags=3, ingredients=3,
+                     updates=0, batch_size=8, stdout=out)
+
+        self.assertEqual(Recepie.objects.count(), 20)
+        self.assertEqual(RecepieTag.objects.count(), 60)
+        self.assertIn('rows/s', out.getvalue())
+        # Two users fit in a batch of 8 recepies
+        self.assertIn('2/5 users', out.getvalue())
+
+    def test_seed_data_replace(self):
+        """Test replacing a prefix doesn't duplicate its users"""
+
+        for _ in range(2):
+            call_command('seed_data', users=2, recepies=1, replace=True,
+                         stdout=StringIO())
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+
+    def test_copy_requires_postgres(self):
+        """Test COPY is refused on other databases"""
+
+        with self.assertRaises(CommandError):
+            call_command('seed_data', users=1, method='copy', stdout=StringIO())
+
+
+class BenchAPITests(TransactionTestCase):
+    """Test the API benchmark"""
+
+    def test_bench_api_writes_results(self):
+        """Test every endpoint is measured and the results saved"""
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, 'results.json')
+
+        call_command('bench_api', users=2, recepies=3, requests=4,
+                     concurrency=2, output=output, stdout=StringIO())
+
+        with open(output) as file:
+            report = json.load(file)
+        self.assertEqual(set(report['endpoints']), {
+            'recepie-list', 'recepie-detail', 'tag-list', 'ingredient-list',
+            'user-me', 'update-list'})
+        for result in report['endpoints'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['requests'], 4)
+        self.assertIsNotNone(
+            report['endpoints']['recepie-list']['queries_per_request'])
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_bench_api_reuse_without_users(self):
+        """Test reusing a data set that was never kept is an error"""
+
+        with self.assertRaises(CommandError):
+            call_command('bench_api', reuse=True, requests=1, stdout=StringIO())
+
+    def test_server_queries_parsed(self):
+        """Test query counts are read from Server-Timing"""
+
+        self.assertEqual(server_queries(
+            'db;dur=1.20;desc="3 queries", total;dur=4.00'), 3)
+        self.assertIsNone(server_queries(None))
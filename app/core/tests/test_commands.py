@@ -1,9 +1,15 @@
 """ unit tests for management commands """
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from core.management.commands.serve import ServerApplication
+from user.authentication import token_cache
+from core.management.commands.wait_for_db import Command
 
 
 class CommandTest(TestCase):
@@ -11,17 +17,93 @@ class CommandTest(TestCase):
     def test_wait_for_db_ready(self):
         """ Test waiting for DB when DB is available """
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
+        with patch.object(Command, '_check', return_value=None) as check:
+            call_command('wait_for_db', stdout=StringIO())
+
+            self.assertEqual(check.call_count, 1)
+
+    def test_wait_for_db_queries_database(self):
+        """ Test the database is actually queried """
 
-            self.assertEqual(gi.call_count, 1)
+        out = StringIO()
+        with self.assertNumQueries(1):
+            call_command('wait_for_db', stdout=out)
+
+        self.assertIn('Database Available!', out.getvalue())
 
     @patch('time.sleep', return_value=True)
-    def test_wait_for_db(self, time_stamp):
+    def test_wait_for_db(self, sleep):
         """ Test wait for DB to be ready """
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        with patch.object(Command, '_check') as check:
+            check.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', stdout=StringIO())
+
+            self.assertEqual(check.call_count, 6)
+        self.assertEqual(sleep.call_count, 5)
+
+    @patch('random.uniform', return_value=1)
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_backs_off(self, sleep, uniform):
+        """ Test delays double up to the max interval """
+
+        with patch.object(Command, '_check') as check:
+            check.side_effect = [OperationalError] * 4 + [None]
+            call_command('wait_for_db', interval=1, max_interval=3,
+                         stdout=StringIO())
+
+        self.assertEqual([call.args[0] for call in sleep.call_args_list],
+                         [1, 2, 3, 3])
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, sleep):
+        """ Test the command fails once the timeout is over """
+
+        with patch.object(Command, '_check', side_effect=OperationalError), \
+                patch('time.monotonic', side_effect=[0, 1, 2, 11]):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=10, stdout=StringIO())
+
+        self.assertEqual(sleep.call_count, 2)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_migrations(self, sleep):
+        """ Test waiting until migrations are applied """
+
+        plans = [[('migration', False)], []]
+        with patch('django.db.migrations.executor.MigrationExecutor.migration_plan',
+                   side_effect=plans):
+            call_command('wait_for_db', wait_for_migrations=True,
+                         stdout=StringIO())
+
+        self.assertEqual(sleep.call_count, 1)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_serve_configures_workers(self):
+        """ Test serve runs gunicorn with recycled workers """
+
+        with patch.object(ServerApplication, 'run', autospec=True) as run, \
+                patch.object(token_cache, 'shared_alias', None):
+            call_command('serve', workers=3, max_requests=500)
+            shared_alias = token_cache.shared_alias
+
+        server = run.call_args.args[0]
+        self.assertEqual(server.cfg.workers, 3)
+        self.assertEqual(server.cfg.max_requests, 500)
+        self.assertEqual(server.cfg.max_requests_jitter, 100)
+        self.assertFalse(server.cfg.reload)
+        # Tokens are cached in the cache every worker shares
+        self.assertEqual(shared_alias, 'default')
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_serve_refuses_workers_without_shared_cache(self):
+        """ Test many workers need a cache shared between processes """
+
+        with patch.object(ServerApplication, 'run', autospec=True) as run:
+            with self.assertRaises(CommandError):
+                call_command('serve', workers=3)
+            call_command('serve', workers=1)
+
+        self.assertEqual(run.call_count, 1)
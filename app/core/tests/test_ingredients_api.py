@@ -1,10 +1,13 @@
 from django.test import TestCase
+from django.core.cache import cache
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.testing import QueryBudgetMixin, query_budget
+
 from core.models import Ingredient, Recepie
 from recepie.serializers import IngredientSerializer
 
@@ -25,15 +28,17 @@ class PublicIngredientsAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateIngredientsAPITest(TestCase):
+class PrivateIngredientsAPITest(QueryBudgetMixin, TestCase):
     """Test Private APIs"""
 
     def setUp(self) -> None:
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             email='test@example.com', password='admin12345')
         self.client.force_authenticate(self.user)
 
+    @query_budget(1)
     def test_ingrident_list(self):
         """Test retriving Ingreident list"""
 
@@ -46,8 +51,8 @@ class PrivateIngredientsAPITest(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(len(res.data['results']), 2)
 
     def test_ingredients_limited_to_current_user(self):
         """Test user can only access their ingredients"""
@@ -60,8 +65,22 @@ class PrivateIngredientsAPITest(TestCase):
 
         res = self.client.get(INGREDIENTS_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0].get('name'), ingred.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0].get('name'), ingred.name)
+
+    @query_budget(1)
+    def test_ingredients_list_queries_dont_scale(self):
+        """Test listing assigned ingredients doesn't query per row"""
+
+        def grow(count):
+            recepie = Recepie.objects.create(
+                user=self.user, title='Cake', minutes_to_deliver=5, price=5)
+            for index in range(Ingredient.objects.count(), count):
+                recepie.ingredients.add(Ingredient.objects.create(
+                    user=self.user, name=f'Ingredient {index}'))
+
+        self.assertQueriesDontScale(grow, lambda: self.client.get(
+            INGREDIENTS_URL, {'assigned_only': 1}))
 
     def test_create_ingredent_successful(self):
         """Test ingredient is created successfull"""
@@ -81,6 +100,7 @@ class PrivateIngredientsAPITest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @query_budget(1)
     def test_ingredients_assigned_to_recepie(self):
         """Test only those ingredients are returned assigned to recepie"""
 
@@ -97,8 +117,8 @@ class PrivateIngredientsAPITest(TestCase):
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertNotIn(serializer2.data, response.data)
+        self.assertIn(serializer1.data, response.data['results'])
+        self.assertNotIn(serializer2.data, response.data['results'])
 
     def test_ingredients_filter_unique(self):
         """Test unique ingredients are assigned"""
@@ -117,4 +137,19 @@ class PrivateIngredientsAPITest(TestCase):
         recepie2.ingredients.add(ingredient1)
 
         response = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_assigned_ingredients_cache_invalidated(self):
+        """Test removing ingredients from recepies refreshes the list"""
+
+        ingredient = Ingredient.objects.create(user=self.user, name='Rice')
+        recepie = Recepie.objects.create(
+            title='Biryani', minutes_to_deliver=45, price=300, user=self.user)
+        recepie.ingredients.add(ingredient)
+        response = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+        self.assertEqual(len(response.data['results']), 1)
+
+        ingredient.recepie_set.remove(recepie)
+        response = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(response.data['results']), 0)
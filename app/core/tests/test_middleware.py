@@ -0,0 +1,160 @@
+"""Test cases for the performance middleware & metrics"""
+
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.middleware import PerformanceMiddleware
+from core.models import Tag
+from updates.models import UpdateModel
+
+
+TAGS_URL = reverse('recepie:tag-list')
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Test requests are measured"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        metrics.registry.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test responses report db, serializer & total time"""
+
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        response = self.client.get(TAGS_URL)
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('serializer;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_recorded_per_view(self):
+        """Test histograms are labelled with the view & method"""
+
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+
+        queries = metrics.registry.get(
+            'http_request_db_queries', view='recepie:tag-list', method='GET')
+        self.assertEqual(queries.count, 2)
+        self.assertGreater(queries.sum, 0)
+
+        self.client.force_login(get_user_model().objects.create_user(
+            email='staff@example.com', password='admin12345', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",view="recepie:tag-list"} 2',
+            body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_restricted(self):
+        """Test only staff & holders of the metrics token read /metrics"""
+
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-secret')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_token_unset(self):
+        """Test no token opens /metrics when METRICS_TOKEN isn't set"""
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(SLOW_REQUEST_SECONDS=0)
+    def test_slow_request_logged_with_sql(self):
+        """Test slow requests are logged with their queries"""
+
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(TAGS_URL)
+
+        record = logs.records[0]
+        self.assertEqual(record.view, 'recepie:tag-list')
+        self.assertTrue(any('core_tag' in sql for sql in record.sql))
+
+    def test_streaming_queries_counted(self):
+        """Test queries run while streaming a response are counted"""
+
+        UpdateModel.objects.create(user=self.user, content='Streamed')
+
+        response = self.client.get('/api/updates/')
+        labels = {'view': response.wsgi_request.resolver_match.view_name,
+                  'method': 'GET'}
+        self.assertIsNone(
+            metrics.registry.get('http_request_db_queries', **labels))
+        content = b''.join(response.streaming_content)
+
+        self.assertEqual(
+            metrics.registry.get('http_request_db_queries', **labels).sum, 2)
+        self.assertEqual(
+            metrics.registry.get('http_response_size_bytes', **labels).sum,
+            len(content))
+
+    def test_async_chain(self):
+        """Test the middleware stays async in front of async handlers"""
+
+        async def get_response(request):
+            return HttpResponse('async')
+
+        middleware = PerformanceMiddleware(get_response)
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/async/'))
+        self.assertEqual(response.content, b'async')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_nested_serializers_timed_once(self):
+        """Test nested serializer time isn't counted twice"""
+
+        timings, token = metrics.start_request()
+        try:
+            with metrics.timed('serializer'):
+                with metrics.timed('serializer'):
+                    pass
+        finally:
+            metrics.end_request(token)
+
+        self.assertEqual(list(timings.durations), ['serializer'])
+
+
+class HistogramTests(TestCase):
+    """Test the Prometheus rendering"""
+
+    def test_buckets_are_cumulative(self):
+        """Test each bucket counts the values up to its bound"""
+
+        registry = metrics.Registry()
+        registry.describe('sizes', 'Sizes', (10, 100))
+        for value in (5, 50, 500):
+            registry.observe('sizes', value, view='a')
+
+        body = registry.render()
+
+        self.assertIn('sizes_bucket{view="a",le="10"} 1', body)
+        self.assertIn('sizes_bucket{view="a",le="100"} 2', body)
+        self.assertIn('sizes_bucket{view="a",le="+Inf"} 3', body)
+        self.assertIn('sizes_sum{view="a"} 555', body)
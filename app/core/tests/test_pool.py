@@ -0,0 +1,192 @@
+"""Test cases for the database connection pool"""
+
+import threading
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from core import metrics
+from core.db.backends.postgresql.base import DatabaseWrapper
+from core.db.pool import Pool, PoolTimeout
+
+
+class FakeConnection:
+
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Factory:
+
+    def __init__(self):
+        self.made = []
+
+    def __call__(self):
+        connection = FakeConnection(len(self.made))
+        self.made.append(connection)
+        return connection
+
+
+class PoolTests(SimpleTestCase):
+    """Test connections are reused & bounded"""
+
+    def setUp(self) -> None:
+        self.factory = Factory()
+
+    def test_released_connection_reused(self):
+        """Test a released connection is handed out again"""
+
+        pool = Pool(self.factory, max_size=2, timeout=1)
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(len(self.factory.made), 1)
+
+    def test_acquire_times_out_when_exhausted(self):
+        """Test acquiring past max_size waits then raises"""
+
+        pool = Pool(self.factory, max_size=1, timeout=0.05)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertEqual(len(self.factory.made), 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting thread gets the next released connection"""
+
+        pool = Pool(self.factory, max_size=1, timeout=5)
+        connection = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+
+        pool.release(connection)
+        waiter.join()
+
+        self.assertEqual(acquired, [connection])
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_seconds'], 0)
+
+    def test_discard_frees_slot(self):
+        """Test discarding closes the connection & allows a new one"""
+
+        pool = Pool(self.factory, max_size=1, timeout=0.05)
+        connection = pool.acquire()
+        pool.discard(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire(), connection)
+
+    def test_broken_idle_connection_replaced(self):
+        """Test idle connections failing the check are replaced"""
+
+        pool = Pool(self.factory, max_size=1, timeout=0.05,
+                    check=lambda connection: False)
+        connection = pool.acquire()
+        pool.release(connection)
+
+        replacement = pool.acquire()
+
+        self.assertTrue(connection.closed)
+        self.assertIsNot(replacement, connection)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_failed_factory_frees_slot(self):
+        """Test a connection that can't be made doesn't leak its slot"""
+
+        def failing():
+            raise ConnectionError()
+
+        pool = Pool(failing, max_size=1, timeout=0.05)
+        with self.assertRaises(ConnectionError):
+            pool.acquire()
+
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class PooledBackendTests(SimpleTestCase):
+    """Test the postgres backend returns connections to its pool"""
+
+    def _wrapper(self, alias):
+        return DatabaseWrapper({
+            'NAME': 'test', 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+            'OPTIONS': {}, 'TIME_ZONE': None, 'CONN_MAX_AGE': 0,
+            'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+            'POOL': {'MAX_SIZE': 1, 'TIMEOUT': 0.05},
+        }, alias)
+
+    def _connection(self, status):
+        connection = MagicMock(closed=0)
+        connection.info.transaction_status = status
+        return connection
+
+    def test_idle_connection_returned_to_pool(self):
+        """Test closing a clean connection releases it"""
+
+        wrapper = self._wrapper('pooled-idle')
+        connection = self._connection(extensions.TRANSACTION_STATUS_IDLE)
+        wrapper.connection = wrapper.pool.acquire(lambda: connection)
+
+        wrapper.close()
+
+        self.assertIs(wrapper.pool.acquire(), connection)
+        connection.close.assert_not_called()
+
+    def test_open_transaction_rolled_back(self):
+        """Test a connection left in a transaction is rolled back first"""
+
+        wrapper = self._wrapper('pooled-transaction')
+        connection = self._connection(extensions.TRANSACTION_STATUS_INERROR)
+        wrapper.connection = wrapper.pool.acquire(lambda: connection)
+
+        wrapper.close()
+
+        connection.rollback.assert_called_once()
+        self.assertEqual(wrapper.pool.stats()['idle'], 1)
+        self.assertEqual(wrapper.pool.stats()['in_use'], 0)
+
+    def test_broken_connection_discarded(self):
+        """Test connections in an unknown state are closed"""
+
+        wrapper = self._wrapper('pooled-broken')
+        connection = self._connection(extensions.TRANSACTION_STATUS_UNKNOWN)
+        wrapper.connection = wrapper.pool.acquire(lambda: connection)
+
+        wrapper.close()
+
+        connection.close.assert_called_once()
+        self.assertEqual(wrapper.pool.stats()['size'], 0)
+
+    def test_pool_follows_connection_params(self):
+        """Test renaming the database (like the test runner) gets a new pool"""
+
+        wrapper = self._wrapper('pooled-renamed')
+        pool = wrapper.pool
+        self.assertIs(wrapper.pool, pool)
+
+        wrapper.settings_dict['NAME'] = 'test_test'
+
+        self.assertIsNot(wrapper.pool, pool)
+
+    def test_stats_in_metrics(self):
+        """Test every pool is exported, labelled with its alias & database"""
+
+        wrapper = self._wrapper('pooled-metrics')
+        wrapper.pool.acquire(lambda: self._connection(
+            extensions.TRANSACTION_STATUS_IDLE))
+
+        body = metrics.registry.render()
+
+        self.assertIn('# TYPE db_pool_in_use gauge', body)
+        self.assertIn('db_pool_in_use{alias="pooled-metrics",database="test"} 1', body)
+        self.assertIn(
+            'db_pool_acquired_total{alias="pooled-metrics",database="test"} 1', body)
@@ -0,0 +1,147 @@
+"""Test cases for content addressed media storage"""
+
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import MediaBlob, Recepie
+from updates.models import UpdateModel
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing, counting & collecting media blobs"""
+
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+
+    def _recepie(self, content=b'image', name='photo.jpg'):
+        recepie = Recepie(user=self.user, title='Salad',
+                          minutes_to_deliver=5, price=10)
+        recepie.image.save(name, ContentFile(content))
+        return recepie
+
+    def _references(self, name):
+        return MediaBlob.objects.get(name=name).references
+
+    def test_identical_content_stored_once(self):
+        """Test saving the same content twice returns one name"""
+
+        first = default_storage.save('a.jpg', ContentFile(b'same'))
+        second = default_storage.save('upload/b.JPG', ContentFile(b'same'))
+        third = default_storage.save('c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertTrue(first.startswith('blobs/'))
+        self.assertEqual(len(os.listdir(os.path.dirname(default_storage.path(first)))), 1)
+
+    def test_blobs_served_immutable(self):
+        """Test content addressed files may be cached forever"""
+
+        name = default_storage.save('a.jpg', ContentFile(b'image'))
+
+        response = self.client.get(f'/media/{name}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_media_not_modified(self):
+        """Test unchanged media files are validated by their mtime"""
+
+        name = default_storage.save('a.jpg', ContentFile(b'image'))
+        response = self.client.get(f'/media/{name}')
+        self.assertEqual(b''.join(response.streaming_content), b'image')
+
+        response = self.client.get(
+            f'/media/{name}', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_media_outside_root_not_served(self):
+        """Test paths leaving MEDIA_ROOT or naming directories are 404"""
+
+        default_storage.save('a.jpg', ContentFile(b'image'))
+
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/blobs').status_code, 404)
+
+    def test_references_counted_across_models(self):
+        """Test recepies & updates sharing an image count references"""
+
+        recepie = self._recepie()
+        update = UpdateModel(user=self.user, content='New dish')
+        update.image.save('dish.jpg', ContentFile(b'image'))
+        name = recepie.image.name
+
+        self.assertEqual(update.image.name, name)
+        self.assertEqual(self._references(name), 2)
+
+        recepie.delete()
+        self.assertEqual(self._references(name), 1)
+
+    def test_replacing_image_releases_old(self):
+        """Test the previous image loses its reference"""
+
+        recepie = self._recepie()
+        old_name = recepie.image.name
+
+        recepie.image.save('new.jpg', ContentFile(b'new image'))
+
+        self.assertEqual(self._references(old_name), 0)
+        self.assertEqual(self._references(recepie.image.name), 1)
+
+    def test_referenced_blob_not_deleted(self):
+        """Test deleting a file still referenced keeps it"""
+
+        recepie = self._recepie()
+
+        default_storage.delete(recepie.image.name)
+
+        self.assertTrue(default_storage.exists(recepie.image.name))
+
+    def test_collect_media_deletes_orphans(self):
+        """Test unreferenced blobs are collected, referenced ones kept"""
+
+        recepie = self._recepie()
+        orphan = self._recepie(content=b'orphan')
+        orphan_name = orphan.image.name
+        orphan.delete()
+
+        call_command('collect_media', grace=-1, stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(recepie.image.name))
+        self.assertFalse(default_storage.exists(orphan_name))
+        self.assertFalse(MediaBlob.objects.filter(name=orphan_name).exists())
+
+    def test_collect_media_keeps_recent_files(self):
+        """Test files inside the grace period are kept"""
+
+        name = default_storage.save('upload.jpg', ContentFile(b'pending'))
+
+        call_command('collect_media', stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(name))
+
+    def test_collect_media_recount(self):
+        """Test recounting repairs wrong reference counts"""
+
+        recepie = self._recepie()
+        MediaBlob.objects.update(references=0)
+
+        call_command('collect_media', recount=True, grace=-1, stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(recepie.image.name))
+        self.assertEqual(self._references(recepie.image.name), 1)
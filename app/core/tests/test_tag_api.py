@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import TestCase
 
@@ -7,6 +8,8 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.testing import QueryBudgetMixin, query_budget
+
 from core.models import Tag, Recepie
 from recepie.serializers import TagSerializer
 
@@ -27,16 +30,18 @@ class PublicTagsAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsAPITest(TestCase):
+class PrivateTagsAPITest(QueryBudgetMixin, TestCase):
     """Test the authoried user Tags APIs"""
 
     def setUp(self) -> None:
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             email='test@example.com', password='admin12345'
         )
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
+    @query_budget(1)
     def test_retrive_tags(self):
         """ Test retrieving tags"""
 
@@ -48,7 +53,7 @@ class PrivateTagsAPITest(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test user can retrieve only their tags"""
@@ -63,8 +68,22 @@ class PrivateTagsAPITest(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+
+    @query_budget(1)
+    def test_tags_list_queries_dont_scale(self):
+        """Test listing assigned tags doesn't query per row"""
+
+        def grow(count):
+            recepie = Recepie.objects.create(
+                user=self.user, title='Cake', minutes_to_deliver=5, price=5)
+            for index in range(Tag.objects.count(), count):
+                recepie.tags.add(Tag.objects.create(
+                    user=self.user, name=f'Tag {index}'))
+
+        self.assertQueriesDontScale(grow, lambda: self.client.get(
+            TAGS_URL, {'assigned_only': 1}))
 
     def test_create_tag_succesfully(self):
         """Test tags are created successfully"""
@@ -83,6 +102,7 @@ class PrivateTagsAPITest(TestCase):
         res = self.client.post(TAGS_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @query_budget(1)
     def test_retrive_tags_assigned_to_recepie(self):
         """ Filter tags assigned to a recepie """
 
@@ -99,8 +119,8 @@ class PrivateTagsAPITest(TestCase):
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertNotIn(serializer2.data, response.data)
+        self.assertIn(serializer1.data, response.data['results'])
+        self.assertNotIn(serializer2.data, response.data['results'])
 
     def test_recepie_tags_assigned_are_unique(self):
         """Test Only those tags are returned that are assigned to Recepies"""
@@ -120,4 +140,104 @@ class PrivateTagsAPITest(TestCase):
 
         response = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_tags_with_same_name_paginated(self):
+        """Test tags sharing a name are neither skipped nor repeated"""
+
+        tags = [Tag.objects.create(user=self.user, name='Vegan')
+                for _ in range(5)]
+
+        seen = []
+        response = self.client.get(TAGS_URL, {'page_size': 2})
+        while True:
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(seen, [tag.id for tag in reversed(tags)])
+
+    def test_tag_list_sparse_fields(self):
+        """Test ?fields= prunes tags & their cached lists separately"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        response = self.client.get(TAGS_URL, {'fields': 'id'})
+
+        self.assertEqual(response.data['results'], [{'id': tag.id}])
+        response = self.client.get(TAGS_URL, {'expand': 'recepies'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tag_list_served_from_cache(self):
+        """Test repeated tag lists don't query the database"""
+
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_tag_list_cache_invalidated_on_change(self):
+        """Test creating, renaming & deleting tags refreshes the list"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        Tag.objects.create(user=self.user, name='Dessert')
+        response = self.client.get(TAGS_URL)
+        self.assertEqual(len(response.data['results']), 2)
+
+        tag.name = 'Breakfast'
+        tag.save()
+        response = self.client.get(TAGS_URL)
+        self.assertIn('Breakfast', [t['name'] for t in response.data['results']])
+
+        tag.delete()
+        response = self.client.get(TAGS_URL)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_assigned_tags_cache_invalidated(self):
+        """Test assigning tags & deleting recepies refreshes the list"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recepie = Recepie.objects.create(
+            title='Salad', minutes_to_deliver=5, price=10, user=self.user)
+        self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        recepie.tags.add(tag)
+        response = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(response.data['results']), 1)
+
+        recepie.delete()
+        response = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(response.data['results']), 0)
+
+    def test_tag_list_cache_is_per_user(self):
+        """Test users never see each other's cached tags"""
+
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        user_2 = get_user_model().objects.create_user(
+            email='admin@example.com', password='admin12345')
+        self.client.force_authenticate(user_2)
+        response = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(response.data['results']), 0)
+
+    def test_unchanged_tag_list_not_modified(self):
+        """Test tag lists answer a matching ETag with 304"""
+
+        Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        response = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Tag.objects.create(user=self.user, name='Dessert')
+        response = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
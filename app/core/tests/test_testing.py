@@ -0,0 +1,44 @@
+"""Test cases for the query budget test helpers"""
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Tag
+from core.testing import QueryBudgetMixin
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test budgets fail with the offending SQL"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+
+    def test_budget_breach_lists_sql(self):
+        """Test going over the budget fails listing the queries"""
+
+        with self.assertRaises(AssertionError) as context:
+            with self.assertMaxQueries(1):
+                list(Tag.objects.all())
+                list(Tag.objects.filter(name='Vegan'))
+
+        self.assertIn('2 queries run, the budget is 1', str(context.exception))
+        self.assertIn('"core_tag"."name" = ', str(context.exception))
+
+    def test_scaling_queries_detected(self):
+        """Test a query per row is reported"""
+
+        def grow(count):
+            for index in range(Tag.objects.count(), count):
+                Tag.objects.create(user=self.user, name=f'Tag {index}')
+
+        def n_plus_one():
+            for tag in Tag.objects.all():
+                tag.user.email
+
+        with self.assertRaises(AssertionError) as context:
+            self.assertQueriesDontScale(grow, n_plus_one, sizes=(2, 5))
+
+        self.assertIn('3 queries with 2 rows but 6 with 5', str(context.exception))
+        self.assertQueriesDontScale(
+            grow, lambda: list(Tag.objects.select_related('user')), sizes=(5, 8))
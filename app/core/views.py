@@ -0,0 +1,68 @@
+"""Views shared by the whole project"""
+
+import os
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseForbidden, HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import metrics
+
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def media(request, path):
+    """Serve an uploaded file
+
+    Streamed from an open file, which WSGI servers like gunicorn send with
+    sendfile. Only routed when ``SERVE_MEDIA`` is set: a proxy serving
+    ``MEDIA_ROOT`` itself does better still. Names under the content
+    addressed prefix never change content, so clients may cache them forever.
+    """
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        status = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(status.st_mode):
+        raise Http404
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              status.st_mtime, status.st_size):
+        return HttpResponseNotModified()
+
+    response = FileResponse(open(full_path, 'rb'))
+    response['Last-Modified'] = http_date(status.st_mtime)
+    prefix = getattr(default_storage, 'prefix', None)
+    if prefix and path.startswith(f'{prefix}/'):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def _may_read_metrics(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(settings.METRICS_TOKEN) and scheme.lower() == 'bearer' and (
+        constant_time_compare(token, settings.METRICS_TOKEN))
+
+
+def metrics_view(request):
+    """Expose this process' request histograms to Prometheus
+
+    Only to staff & to requests bearing ``METRICS_TOKEN``: the metrics name
+    every view and reveal how busy the server is.
+    """
+
+    if not _may_read_metrics(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.registry.render(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,73 @@
+"""Per user, versioned caching of recepie API responses
+
+Every user has a version per model. Changing one of their objects bumps the
+version (see ``recepie.signals``), so cached responses are never deleted one
+by one, they simply stop being looked up and expire.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Max
+
+
+LIST_TIMEOUT = 60 * 60
+
+
+def _version_key(model, user_id):
+    return f'recepie:{model._meta.model_name}:version:{user_id}'
+
+
+def get_version(model, user_id):
+    """Return the current version of a user's objects of ``model``"""
+
+    key = _version_key(model, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, None)
+        version = cache.get(key)
+    return version
+
+
+def _modified_key(model, user_id, version):
+    return f'recepie:{model._meta.model_name}:last-modified:{user_id}:{version}'
+
+
+def bump_version(model, user_id):
+    """Invalidate everything cached for a user's objects of ``model``"""
+
+    key = _version_key(model, user_id)
+    previous = cache.get(key) or 0
+    version = max(time.time_ns() // 1000, previous + 1)
+    cache.set(key, version, None)
+    # The objects changed just now, whether saved, related or deleted
+    cache.set(_modified_key(model, user_id, version),
+              time.time_ns() // 10 ** 9, LIST_TIMEOUT)
+
+
+def last_modified(model, user_id):
+    """Return when a user's objects of ``model`` last changed, as a timestamp
+
+    That's the time of the last bump, or for a version nothing bumped yet
+    the latest ``updated_at`` (None when there are no objects).
+    """
+
+    version = get_version(model, user_id)
+    key = _modified_key(model, user_id, version)
+    timestamp = cache.get(key)
+    if timestamp is None:
+        latest = model.objects.filter(user_id=user_id).aggregate(
+            latest=Max('updated_at'))['latest']
+        timestamp = int(latest.timestamp()) if latest else 0
+        cache.set(key, timestamp, LIST_TIMEOUT)
+    return timestamp or None
+
+
+def response_key(model, request):
+    """Return the cache key of a response to ``request`` listing ``model``"""
+
+    user_id = request.user.pk
+    url = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    version = get_version(model, user_id)
+    return f'recepie:{model._meta.model_name}:response:{user_id}:{version}:{url}'
@@ -0,0 +1,74 @@
+"""Serializer fields for recepie APIs"""
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to objects of the requesting user
+
+    With ``many=True`` every id is resolved by a single query.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None:
+            queryset = queryset.filter(user=request.user)
+        return queryset
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
+
+class BatchedManyRelatedField(ManyRelatedField):
+    """Resolve a list of primary keys with one ``pk__in`` query"""
+
+    default_error_messages = {
+        'does_not_exist': 'Invalid pk(s) {pk_value} - object does not exist.',
+        'incorrect_type': 'Incorrect type. Expected pk value, received {data_type}.',
+    }
+
+    def to_pks(self, data):
+        """Return the distinct primary keys of ``data``, without queries"""
+
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pk_field = self.child_relation.get_queryset().model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                self.fail('incorrect_type', data_type=type(item).__name__)
+        return list(dict.fromkeys(pks))
+
+    def to_internal_value(self, data):
+        pks = self.to_pks(data)
+        objects = self.child_relation.get_queryset().in_bulk(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            self.fail('does_not_exist', pk_value=missing)
+        return [objects[pk] for pk in pks]
+
+
+class PrimaryKeyListField(BatchedManyRelatedField):
+    """Validate a list of primary keys, leaving the lookup to the caller
+
+    For serializers checking the ids of many items with one query, see
+    ``BulkRecepieListSerializer``.
+    """
+
+    def to_internal_value(self, data):
+        return self.to_pks(data)
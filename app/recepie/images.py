@@ -0,0 +1,104 @@
+"""Background generation of resized recepie images
+
+Uploads only store the original image. Smaller JPEG variants are rendered
+afterwards by a small thread pool and recorded in ``Recepie.image_variants``
+so list responses can link to them instead of the original.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+from core import media
+from core.models import Recepie
+from . import cache
+
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': (150, 150),
+    'medium': (600, 600),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECEPIE_IMAGE_WORKERS,
+                thread_name_prefix='recepie-images')
+    return _executor
+
+
+def schedule_variants(recepie_id):
+    """Render the variants of a recepie image once the transaction commits"""
+
+    if settings.RECEPIE_IMAGE_EAGER:
+        transaction.on_commit(lambda: generate_variants(recepie_id))
+    else:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run_in_worker, recepie_id))
+
+
+def _run_in_worker(recepie_id):
+    close_old_connections()
+    try:
+        generate_variants(recepie_id)
+    except Exception:
+        logger.exception('Failed rendering image variants of recepie %s',
+                         recepie_id)
+    finally:
+        close_old_connections()
+
+
+def _render(image, size):
+    variant = image.copy()
+    variant.thumbnail(size)
+    buffer = BytesIO()
+    variant.save(buffer, format='JPEG', quality=80, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(recepie_id):
+    """Render & store every variant of a recepie's current image"""
+
+    recepie = Recepie.objects.filter(pk=recepie_id).only(
+        'image', 'image_variants', 'user_id').first()
+    if recepie is None or not recepie.image:
+        return
+
+    name = recepie.image.name
+    with recepie.image.open('rb') as source:
+        image = Image.open(source)
+        image = image.convert('RGB')
+
+    storage = recepie.image.storage
+    base = os.path.splitext(name)[0]
+    variants = {
+        label: storage.save(f'{base}_{label}.jpg', _render(image, size))
+        for label, size in VARIANTS.items()
+    }
+
+    # The image may have been replaced while rendering
+    updated = Recepie.objects.filter(pk=recepie_id, image=name).update(
+        image_variants=variants)
+    if not updated:
+        for path in variants.values():
+            storage.delete(path)
+        return
+    # update() sends no signals, so references & versions are kept here
+    media.retain(variants.values())
+    media.release(recepie.image_variants.values())
+    cache.bump_version(Recepie, recepie.user_id)
@@ -0,0 +1,90 @@
+""" Command comparing the serializer & row paths of recepie lists """
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core import seeding
+from core.models import Recepie
+from recepie.rows import RowSerializer
+from recepie.serializers import RecepieSerializer
+
+
+PREFIX = 'bench-list'
+
+
+class Command(BaseCommand):
+    """ Django command measuring how many recepies a second each list path renders """
+
+    help = ('Seed a user with many recepies, render their list to JSON with '
+            'RecepieSerializer and from values() rows, check both produce the '
+            'same bytes and report objects/s')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recepies', type=int, default=2000)
+        parser.add_argument('--tags-per-recepie', type=int, default=3)
+        parser.add_argument('--ingredients-per-recepie', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per path, the fastest counts')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON')
+        parser.add_argument('--force', action='store_true',
+                            help='Allow deleting seeded users from a database '
+                                 'not created by the test runner')
+
+    def handle(self, *args, **options):
+        dataset = seeding.Dataset(
+            users=1, recepies=options['recepies'],
+            tags_per_recepie=options['tags_per_recepie'],
+            ingredients_per_recepie=options['ingredients_per_recepie'],
+            updates=0, prefix=PREFIX)
+        try:
+            seeding.delete(PREFIX, force=options['force'])
+        except seeding.UnsafeDatabase as exc:
+            raise CommandError(exc)
+        seeding.seed(dataset)
+        try:
+            user = get_user_model().objects.get(
+                email=seeding.user_email(dataset, 0))
+            queryset = Recepie.objects.filter(user=user).order_by('-id')
+            rows = RowSerializer(RecepieSerializer())
+            paths = {
+                'serializer': lambda: JSONRenderer().render(RecepieSerializer(
+                    queryset.with_related_ids(), many=True).data),
+                'rows': lambda: JSONRenderer().render(
+                    rows.render(rows.values(queryset))),
+            }
+            results, outputs = {}, {}
+            for name, render in paths.items():
+                results[name], outputs[name] = self._measure(
+                    render, options['repeat'], options['recepies'])
+        finally:
+            seeding.delete(PREFIX, force=options['force'])
+
+        if outputs['serializer'] != outputs['rows']:
+            raise CommandError('The row path rendered different JSON')
+        results['speedup'] = round(
+            results['rows']['objects_per_second']
+            / results['serializer']['objects_per_second'], 2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name in paths:
+            self.stdout.write(
+                f'{name:>10}: {results[name]["objects_per_second"]} objects/s, '
+                f'{results[name]["seconds"]} s per list')
+        self.stdout.write(self.style.SUCCESS(
+            f'Identical output, rows are {results["speedup"]}x faster'))
+
+    def _measure(self, render, repeat, count):
+        best, output = None, None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            output = render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return {'seconds': round(best, 4),
+                'objects_per_second': round(count / best)}, output
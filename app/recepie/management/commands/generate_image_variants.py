@@ -0,0 +1,27 @@
+""" Command to render recepie image variants """
+from django.core.management.base import BaseCommand
+
+from core.models import Recepie
+from recepie.images import generate_variants
+
+
+class Command(BaseCommand):
+    """ Render image variants the background workers haven't produced """
+
+    help = 'Render missing image variants of recepies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Render variants of every recepie image again')
+
+    def handle(self, *args, **options):
+        queryset = Recepie.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            queryset = queryset.filter(image_variants={})
+
+        count = 0
+        for recepie_id in queryset.values_list('id', flat=True).iterator():
+            generate_variants(recepie_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered variants of {count} recepies'))
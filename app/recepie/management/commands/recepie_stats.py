@@ -0,0 +1,47 @@
+""" Command to check or rebuild the recepie stats """
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recepie import stats
+
+
+class Command(BaseCommand):
+    """ Compare the stored recepie stats with the recepies they count """
+
+    help = 'Check the recepie stats of users, or rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', default=[],
+                            help='Email of a user to check, may be repeated')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute the stats instead of checking them')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('id')
+        if options['user']:
+            users = users.filter(email__in=options['user'])
+            missing = set(options['user']) - set(users.values_list('email', flat=True))
+            if missing:
+                raise CommandError(f'Unknown users: {", ".join(sorted(missing))}')
+
+        if options['rebuild']:
+            count = 0
+            for user_id in users.values_list('id', flat=True).iterator():
+                stats.rebuild(user_id)
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the stats of {count} users'))
+            return
+
+        inconsistent = 0
+        for user_id, email in users.values_list('id', 'email').iterator():
+            errors = stats.check(user_id)
+            if errors:
+                inconsistent += 1
+            for kind, value, stored, expected in errors:
+                self.stdout.write(
+                    f'{email} {kind}:{value} stored={stored} expected={expected}')
+        if inconsistent:
+            raise CommandError(
+                f'The stats of {inconsistent} users are inconsistent, '
+                'run with --rebuild to fix them')
+        self.stdout.write(self.style.SUCCESS('The stats are consistent'))
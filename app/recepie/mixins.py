@@ -0,0 +1,144 @@
+"""Viewset mixins for caching & shaping recepie API responses"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .cache import LIST_TIMEOUT, get_version, last_modified, response_key
+from .rows import RowSerializer
+
+
+class CachedListMixin:
+    """List objects, cached until the user changes any of them"""
+
+    def list(self, request, *args, **kwargs):
+        key = response_key(self.queryset.model, request)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, LIST_TIMEOUT)
+        return Response(data)
+
+
+class ConditionalGetMixin:
+    """Answer list & detail GETs with 304 when the client copy is current
+
+    The ETag comes from the user's version of ``queryset.model``, so
+    validating a request neither queries nor serializes anything.
+    Last-Modified is the latest ``updated_at`` of the user's objects, for
+    information only: If-Modified-Since isn't honoured, since relation
+    changes & deletes don't move it and it has one second resolution.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_get(
+            super().retrieve, request, *args, **kwargs)
+
+    def _conditional_get(self, handler, request, *args, **kwargs):
+        version = get_version(self.queryset.model, request.user.pk)
+        tag = f'{version}:{request.accepted_media_type}:{request.get_full_path()}'
+        etag = quote_etag(hashlib.sha1(tag.encode()).hexdigest())
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Authorization',))
+        if response.status_code == 200:
+            timestamp = last_modified(self.queryset.model, request.user.pk)
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class SparseFieldsetMixin:
+    """Let GET requests pick fields with ``?fields=`` & nest relations with ``?expand=``
+
+    Both take comma separated field names. The serializer drops the other
+    fields (see ``SparseFieldsetSerializerMixin``) and ``narrow()`` loads
+    only the columns they need.
+    """
+
+    def _requested(self, param, get_allowed):
+        value = self.request.query_params.get(param)
+        if value is None or self.request.method != 'GET':
+            return None
+        names = frozenset(name.strip() for name in value.split(',') if name.strip())
+        unknown = names - set(get_allowed())
+        if unknown:
+            raise ValidationError(
+                {param: f'Unknown fields: {", ".join(sorted(unknown))}'})
+        return names
+
+    @property
+    def sparse_fields(self):
+        """Return the names of the requested fields, None for every field"""
+
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._requested(
+                'fields', lambda: self.get_serializer_class()().fields)
+            if self._sparse_fields == frozenset():
+                raise ValidationError({'fields': 'Name at least one field'})
+        return self._sparse_fields
+
+    @property
+    def expanded(self):
+        """Return the names of the relations to nest"""
+
+        if not hasattr(self, '_expanded'):
+            self._expanded = self._requested('expand', lambda: getattr(
+                self.get_serializer_class(), 'expandable_fields', {})) or frozenset()
+        return self._expanded
+
+    def wants(self, name):
+        return self.sparse_fields is None or name in self.sparse_fields
+
+    def narrow(self, queryset):
+        """Defer the columns no requested field nor the ordering reads
+
+        The cursor pagination reads the ordering columns of the last row, a
+        deferred one would cost a query per page.
+        """
+
+        if self.sparse_fields is None:
+            return queryset
+        columns = {field.name for field in queryset.model._meta.concrete_fields}
+        fields = self.get_serializer_class()().fields
+        ordering = {field.lstrip('-') for field in queryset.query.order_by}
+        return queryset.only(queryset.model._meta.pk.name, *sorted(
+            {fields[name].source for name in self.sparse_fields
+             if fields[name].source in columns} | (ordering & columns)))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(fields=self.sparse_fields, expand=self.expanded)
+        return context
+
+
+class RowListMixin:
+    """List from ``values()`` rows instead of model & serializer instances
+
+    The output is the serializer's (see ``recepie.rows``). Lists nesting
+    expanded relations still go through the serializer.
+    """
+
+    row_list = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.row_list or getattr(self, 'expanded', None):
+            return super().list(request, *args, **kwargs)
+
+        rows = RowSerializer(self.get_serializer())
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.render(page))
+        return Response(rows.render(queryset))
@@ -0,0 +1,106 @@
+"""Keyset pagination for recepie APIs"""
+
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class RecepieCursorPagination(CursorPagination):
+    """Paginate recepies newest first using an opaque cursor
+
+    The cursor holds the values of every ordering field of the last row, so
+    orderings ending with a unique field never need an offset to skip ties.
+    Views may choose the ordering with a ``get_ordering()`` method.
+    """
+
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, 'get_ordering'):
+            return tuple(view.get_ordering())
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, position = 0, False, None
+        else:
+            offset, reverse, position = self.cursor
+
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}'
+                        for field in self.ordering]
+        else:
+            ordering = self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(
+                results[-1], self.ordering)
+
+        has_position = position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = has_position, following is not None
+            self.next_position, self.previous_position = position, following
+        else:
+            self.has_next, self.has_previous = following is not None, has_position
+            self.next_position, self.previous_position = following, position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _after(self, ordering, position):
+        """Return the filter of rows ordered after ``position``
+
+        ``(a, b) > (x, y)`` is spelled ``a > x OR (a = x AND b > y)``, with a
+        redundant ``a >= x`` so the leading column bounds an index range scan.
+        """
+
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition, equal = Q(), Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value if isinstance(value, (int, str)) else str(value))
+        return json.dumps(values)
+
+
+class AttributeCursorPagination(RecepieCursorPagination):
+    """Paginate tags & ingredients by name, ties are broken by id"""
+
+    ordering = ('-name', '-id')
@@ -0,0 +1,106 @@
+"""Render read-only lists from ``values()`` rows
+
+Building model instances & calling every serializer field per object
+dominates large list responses. ``RowSerializer`` takes the fields of a
+``ModelSerializer``, selects their columns with ``values()``, reads the ids
+of many to many relations grouped by object in one more query (``ARRAY_AGG``
+on PostgreSQL) and builds the same dicts the serializer would, so the
+rendered JSON is byte for byte identical.
+"""
+
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Value
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+from core.metrics import timed
+
+
+# Fields whose to_representation returns the database value unchanged
+PLAIN_FIELDS = (serializers.IntegerField, serializers.CharField,
+                serializers.BooleanField, serializers.JSONField)
+
+
+class RowSerializer:
+    """Serialize rows of ``queryset.values()`` like ``serializer`` would"""
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        # (name, column or None for relations, conversion), in field order
+        self.fields = []
+        self.relations = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, ManyRelatedField):
+                if not isinstance(field.child_relation, PrimaryKeyRelatedField):
+                    raise ValueError(f'{name} must be a list of primary keys')
+                m2m = model._meta.get_field(field.source)
+                self.relations.append((
+                    name, m2m.remote_field.through,
+                    f'{m2m.m2m_field_name()}_id', f'{m2m.m2m_reverse_field_name()}_id'))
+                self.fields.append((name, None, None))
+            elif type(field) in PLAIN_FIELDS and not getattr(field, 'binary', False):
+                self.fields.append((name, field.source, None))
+            else:
+                self.fields.append((name, field.source, field.to_representation))
+        self.pk = model._meta.pk.attname
+
+    def values(self, queryset):
+        """Return the rows of ``queryset``, with the columns of its ordering"""
+
+        ordering = [field.lstrip('-') for field in queryset.query.order_by]
+        return queryset.prefetch_related(None).values(*dict.fromkeys(
+            [self.pk] + [source for _, source, _ in self.fields if source]
+            + ordering))
+
+    def related_ids(self, object_ids):
+        """Return ``{relation: {object id: [related ids]}}``, sorted by id"""
+
+        related = {name: defaultdict(list) for name, _, _, _ in self.relations}
+        if not self.relations or not object_ids:
+            return related
+
+        querysets = []
+        for name, through, source, target in self.relations:
+            rows = through.objects.filter(**{f'{source}__in': object_ids}).order_by()
+            if connection.vendor == 'postgresql':
+                from django.contrib.postgres.aggregates import ArrayAgg
+                rows = rows.values(source).annotate(
+                    ids=ArrayAgg(target, ordering=target)).values_list(
+                        Value(name), source, 'ids')
+            else:
+                rows = rows.values_list(Value(name), source, target)
+            querysets.append(rows)
+        rows = querysets[0].union(*querysets[1:], all=True)
+
+        for name, object_id, ids in rows:
+            if isinstance(ids, list):
+                related[name][object_id] = ids
+            else:
+                related[name][object_id].append(ids)
+        if connection.vendor != 'postgresql':
+            for by_object in related.values():
+                for ids in by_object.values():
+                    ids.sort()
+        return related
+
+    def render(self, rows):
+        """Return the representation of each row"""
+
+        rows = list(rows)
+        related = self.related_ids([row[self.pk] for row in rows])
+        with timed('serializer'):
+            data = []
+            for row in rows:
+                item = {}
+                for name, source, convert in self.fields:
+                    if source is None:
+                        item[name] = related[name].get(row[self.pk], [])
+                        continue
+                    value = row[source]
+                    item[name] = value if convert is None or value is None else convert(value)
+                data.append(item)
+        return data
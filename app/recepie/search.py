@@ -0,0 +1,154 @@
+"""Recepie search over titles, tag names & ingredient names
+
+Every recepie stores the names of its tags & ingredients in ``search_text``,
+kept up to date by ``recepie.signals`` (and the bulk serializer) whenever
+the relations or the names change. On PostgreSQL the title & that text are
+indexed by a weighted ``tsvector`` column and a trigram index (see migration
+0011), other databases search a per user inverted index built in Python and
+cached until the user's recepies change.
+"""
+
+import difflib
+import functools
+import re
+from collections import defaultdict
+
+from django.core.cache import cache as django_cache
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from core.models import Recepie, RecepieIngredient, RecepieTag
+from . import cache
+
+
+TITLE_WEIGHT = 1.0
+RELATED_WEIGHT = 0.4
+FUZZY_RATIO = 0.75
+# Prefixes & typos are only matched when fewer recepies match exactly
+MIN_EXACT_HITS = 1
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def build_search_text(recepie_ids):
+    """Return the ``search_text`` of each recepie, read in one query"""
+
+    names = {recepie_id: [] for recepie_id in recepie_ids}
+    tags = RecepieTag.objects.filter(recepie_id__in=names).values_list(
+        'recepie_id', 'tag__name')
+    ingredients = RecepieIngredient.objects.filter(
+        recepie_id__in=names).values_list('recepie_id', 'ingredient__name')
+    for recepie_id, name in tags.union(ingredients, all=True):
+        names[recepie_id].append(name)
+    return {recepie_id: ' '.join(sorted(values))
+            for recepie_id, values in names.items()}
+
+
+def refresh(recepie_ids):
+    """Recompute the ``search_text`` of the given recepies"""
+
+    recepie_ids = set(recepie_ids)
+    if not recepie_ids:
+        return
+    texts = build_search_text(recepie_ids)
+    Recepie.objects.bulk_update(
+        [Recepie(id=recepie_id, search_text=text)
+         for recepie_id, text in texts.items()],
+        ['search_text'], batch_size=500)
+
+
+def matching_ids(queryset, user_id, query, limit):
+    """Return the ids of the (at most ``limit``) best matching recepies
+
+    Prefixes & typos are only matched when the exact terms match fewer than
+    ``MIN_EXACT_HITS`` recepies of ``queryset``.
+    """
+
+    queryset = queryset.prefetch_related(None)
+    if connection.vendor == 'postgresql':
+        search = _search_postgres
+    else:
+        search = functools.partial(_search_index, _index(user_id))
+    ids = search(queryset, query, limit, fuzzy=False)
+    if len(ids) < MIN_EXACT_HITS:
+        ids = search(queryset, query, limit, fuzzy=True)
+    return ids
+
+
+def _search_postgres(queryset, query, limit, fuzzy):
+    vector = "core_recepie.search_vector @@ plainto_tsquery('simple', %s)"
+    rank = "ts_rank(core_recepie.search_vector, plainto_tsquery('simple', %s))"
+    if fuzzy:
+        document = "(core_recepie.title || ' ' || core_recepie.search_text)"
+        matches = RawSQL(f"({vector} OR %s <%% {document})", (query, query),
+                         output_field=BooleanField())
+        rank = RawSQL(f"{rank} + word_similarity(%s, {document})", (query, query),
+                      output_field=FloatField())
+    else:
+        matches = RawSQL(vector, (query,), output_field=BooleanField())
+        rank = RawSQL(rank, (query,), output_field=FloatField())
+    return list(queryset.annotate(search_match=matches, search_rank=rank)
+                .filter(search_match=True)
+                .order_by('-search_rank', '-id')
+                .values_list('id', flat=True)[:limit])
+
+
+def _index(user_id):
+    """The user's inverted index: token -> {recepie id: weight}"""
+
+    version = cache.get_version(Recepie, user_id)
+    key = f'recepie:search:index:{user_id}:{version}'
+    index = django_cache.get(key)
+    if index is None:
+        index = defaultdict(dict)
+        rows = Recepie.objects.filter(user_id=user_id).values_list(
+            'id', 'title', 'search_text')
+        for recepie_id, title, search_text in rows:
+            for weight, text in ((RELATED_WEIGHT, search_text),
+                                 (TITLE_WEIGHT, title)):
+                for token in tokenize(text):
+                    postings = index[token]
+                    postings[recepie_id] = max(postings.get(recepie_id, 0), weight)
+        index = dict(index)
+        django_cache.set(key, index, cache.LIST_TIMEOUT)
+    return index
+
+
+def _scores(index, query, fuzzy):
+    """Return the score of every recepie matching ``query`` in ``index``"""
+
+    scores = defaultdict(float)
+    for term in set(tokenize(query)):
+        if not fuzzy:
+            matches = [(1.0, index[term])] if term in index else []
+        else:
+            # Prefixes & typos match with a lower score
+            matches = []
+            for token, postings in index.items():
+                if token.startswith(term):
+                    similarity = len(term) / len(token)
+                else:
+                    similarity = difflib.SequenceMatcher(None, term, token).ratio()
+                if similarity >= FUZZY_RATIO or token.startswith(term):
+                    matches.append((similarity, postings))
+        best = {}
+        for similarity, postings in matches:
+            for recepie_id, weight in postings.items():
+                best[recepie_id] = max(best.get(recepie_id, 0), similarity * weight)
+        for recepie_id, score in best.items():
+            scores[recepie_id] += score
+    return scores
+
+
+def _search_index(index, queryset, query, limit, fuzzy):
+    scores = _scores(index, query, fuzzy)
+    if not scores:
+        return []
+    allowed = set(queryset.filter(id__in=scores).values_list('id', flat=True))
+    ranked = sorted(allowed, key=lambda recepie_id: (-scores[recepie_id], -recepie_id))
+    return ranked[:limit]
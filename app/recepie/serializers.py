@@ -1,12 +1,44 @@
 
-from django.db import models
+from django.db import connection, models
 from django.db.models import fields
+from django.utils import timezone
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recepie
+from core import media
+from core.metrics import TimedSerializerMixin
+from core.models import Tag, Ingredient, Recepie, RecepieTag, RecepieIngredient
+from . import cache, search, stats
+from .fields import PrimaryKeyListField, UserPrimaryKeyRelatedField
+from .signals import recepie_media_names
 
 
-class TagSerializer(serializers.ModelSerializer):
+class SparseFieldsetSerializerMixin:
+    """Serialize the ``fields`` of the context only & nest the ``expand`` ones
+
+    ``expandable_fields`` maps relation names to the serializer nesting them.
+    Nested serializers always keep all their fields.
+    """
+
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if parent is not None and not (
+                isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            return fields
+
+        for name in self.context.get('expand') or ():
+            fields[name] = self.expandable_fields[name](many=True, read_only=True)
+        requested = self.context.get('fields')
+        if requested is not None:
+            for name in set(fields) - requested:
+                del fields[name]
+        return fields
+
+
+class TagSerializer(SparseFieldsetSerializerMixin, TimedSerializerMixin,
+                    serializers.ModelSerializer):
     """Serializer for Tag objects"""
 
     class Meta:
@@ -15,7 +47,8 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsetSerializerMixin, TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Serializer for Ingredients"""
 
     class Meta:
@@ -24,20 +57,24 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecepieSerializer(serializers.ModelSerializer):
+class RecepieSerializer(SparseFieldsetSerializerMixin, TimedSerializerMixin,
+                        serializers.ModelSerializer):
     """Serializer for Recepie """
 
-    tags = serializers.PrimaryKeyRelatedField(
+    expandable_fields = {'tags': TagSerializer,
+                         'ingredients': IngredientSerializer}
+
+    tags = UserPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all())
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many=True, queryset=Ingredient.objects.all())
 
     class Meta:
         model = Recepie
-        fields = ('id', 'title', 'price',
-                  'minutes_to_deliver', 'link', 'tags', 'ingredients')
+        fields = ('id', 'title', 'price', 'minutes_to_deliver', 'link',
+                  'tags', 'ingredients', 'image_variants')
 
-        read_only_fields = ('id',)
+        read_only_fields = ('id', 'image_variants')
 
 
 class RecepieDetailSerializer(RecepieSerializer):
@@ -47,10 +84,189 @@ class RecepieDetailSerializer(RecepieSerializer):
     ingredients = IngredientSerializer(many=True, read_only=True)
 
 
-class RecepieImageSerializer(serializers.ModelSerializer):
+class RecepieImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading images"""
 
     class Meta:
         model = Recepie
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_variants')
+        read_only_fields = ('id', 'image_variants')
+
+
+class BulkRecepieListSerializer(serializers.ListSerializer):
+    """Validate & save many recepies with a fixed number of queries"""
+
+    max_items = 1000
+    batch_size = 500
+    relations = (('tags', RecepieTag, 'tag_id'),
+                 ('ingredients', RecepieIngredient, 'ingredient_id'))
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError(
+                {'non_field_errors': ['Expected a list of items']})
+        if len(data) > self.max_items:
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'At most {self.max_items} items are allowed']})
+
+        items, errors = [], []
+        for item in data:
+            try:
+                items.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                items.append({})
+                errors.append(exc.detail)
+
+        if self.instance is not None:
+            owned = {recepie.id for recepie in self.instance}
+            listed = [item.get('id') for item in items if item]
+            for error, item in zip(errors, items):
+                if not item:
+                    continue
+                if item.get('id') not in owned:
+                    error['id'] = ['Recepie does not exist.']
+                elif listed.count(item['id']) > 1:
+                    error['id'] = ['Recepie is listed more than once.']
+
+        for field, _, _ in self.relations:
+            # The ids of every item are looked up with one query
+            relation = self.child.fields[field]
+            requested = {pk for item in items for pk in item.get(field, [])}
+            found = set(relation.child_relation.get_queryset().filter(
+                pk__in=requested).values_list('pk', flat=True))
+            for error, item in zip(errors, items):
+                missing = [pk for pk in item.get(field, []) if pk not in found]
+                if missing:
+                    error[field] = [relation.error_messages['does_not_exist'].format(
+                        pk_value=missing)]
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        user = self.context['request'].user
+        recepies = []
+        for item in validated_data:
+            fields = {key: value for key, value in item.items()
+                      if key not in ('id', 'tags', 'ingredients')}
+            recepies.append(Recepie(user=user, **fields))
+
+        delta = stats.Delta(user.pk)
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recepie.objects.bulk_create(recepies, batch_size=self.batch_size)
+            for recepie in recepies:
+                delta.recepie(recepie.price, recepie.minutes_to_deliver)
+        else:
+            for recepie in recepies:
+                recepie.save()
+
+        self._add_relations(recepies, validated_data)
+        search.refresh(recepie.id for recepie in recepies)
+        self._count_relations(delta, validated_data)
+        delta.apply()
+        self._bump_versions(user)
+        return recepies
+
+    def update(self, instance, validated_data):
+        user = self.context['request'].user
+        by_id = {recepie.id: recepie for recepie in instance}
+        recepies, fields = [], {'updated_at'}
+        now = timezone.now()
+        for item in validated_data:
+            recepie = by_id[item['id']]
+            for key, value in item.items():
+                if key not in ('id', 'tags', 'ingredients'):
+                    setattr(recepie, key, value)
+                    fields.add(key)
+            recepie.updated_at = now
+            recepies.append(recepie)
+
+        stored = stats.stored_values(list(by_id))
+        Recepie.objects.bulk_update(
+            recepies, sorted(fields), batch_size=self.batch_size)
+        delta = stats.Delta(user.pk)
+        for recepie in recepies:
+            delta.recepie(*stored[recepie.id], sign=-1)
+            delta.recepie(recepie.price, recepie.minutes_to_deliver)
+
+        for field, through, column in self.relations:
+            replaced = through.objects.filter(recepie_id__in=[
+                item['id'] for item in validated_data if field in item])
+            delta.related(stats.RELATIONS[through][0],
+                          replaced.values_list(column, flat=True), -1)
+            replaced.delete()
+        self._add_relations(recepies, validated_data)
+        search.refresh(item['id'] for item in validated_data
+                       if 'tags' in item or 'ingredients' in item)
+        self._count_relations(delta, validated_data)
+        delta.apply()
+        self._bump_versions(user)
+        return recepies
+
+    def delete(self):
+        """Delete the recepies of the ``instance`` queryset
+
+        ``QuerySet.delete()`` sends the delete signals once per recepie, each
+        reading & writing the stats and media. This does it once for all.
+        """
+
+        user = self.context['request'].user
+        recepies = list(self.instance.select_for_update().only(
+            'id', 'price', 'minutes_to_deliver', 'image', 'image_variants'))
+        ids = [recepie.id for recepie in recepies]
+        delta = stats.Delta(user.pk)
+        for recepie in recepies:
+            delta.recepie(recepie.price, recepie.minutes_to_deliver, sign=-1)
+        for kind, related in stats.related_ids(ids).items():
+            delta.related(kind, related, -1)
+
+        for _, through, _ in self.relations:
+            through.objects.filter(recepie_id__in=ids).delete()
+        # Nothing refers to the recepies anymore, skip the collector & signals
+        deleted = Recepie.objects.filter(id__in=ids)
+        deleted._raw_delete(deleted.db)
+        media.release(name for recepie in recepies
+                      for name in recepie_media_names(recepie) if name)
+        delta.apply()
+        self._bump_versions(user)
+
+    def _add_relations(self, recepies, validated_data):
+        """Insert the through rows of every recepie"""
+
+        for field, through, column in self.relations:
+            rows = [through(recepie_id=recepie.id, **{column: pk})
+                    for recepie, item in zip(recepies, validated_data)
+                    for pk in dict.fromkeys(item.get(field, []))]
+            through.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def _count_relations(self, delta, validated_data):
+        """Count the relations set by the items in the stats"""
+
+        for field, through, _ in self.relations:
+            delta.related(stats.RELATIONS[through][0],
+                          [pk for item in validated_data
+                           for pk in dict.fromkeys(item.get(field, []))])
+
+    def _bump_versions(self, user):
+        """Bulk writes don't send the signals doing this"""
+
+        for model in (Recepie, Tag, Ingredient):
+            cache.bump_version(model, user.pk)
+
+
+class RecepieBulkSerializer(RecepieSerializer):
+    """Serializer for each item of a bulk recepie request"""
+
+    id = serializers.IntegerField(required=False)
+    tags = PrimaryKeyListField(
+        child_relation=UserPrimaryKeyRelatedField(queryset=Tag.objects.all()),
+        required=False)
+    ingredients = PrimaryKeyListField(
+        child_relation=UserPrimaryKeyRelatedField(queryset=Ingredient.objects.all()),
+        required=False)
+
+    class Meta(RecepieSerializer.Meta):
+        list_serializer_class = BulkRecepieListSerializer
+        read_only_fields = ('image_variants',)
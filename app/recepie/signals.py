@@ -0,0 +1,109 @@
+"""Invalidate cached recepie API responses, refresh the search text and
+update the stats of recepies when the data changes
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from core import media
+from core.models import (Ingredient, Recepie, RecepieIngredient, RecepieStat,
+                         RecepieTag, Tag)
+from . import cache, search, stats
+
+
+def recepie_media_names(recepie):
+    return [recepie.image.name, *recepie.image_variants.values()]
+
+
+media.track(Recepie, recepie_media_names)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def attribute_deleting(sender, instance, **kwargs):
+    # The through rows go without an m2m_changed signal
+    instance._search_recepie_ids = list(
+        instance.recepie_set.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+def attribute_changed(sender, instance, signal, created=False, **kwargs):
+    # Refreshed before the versions change so no search indexes stale text
+    if signal is post_delete:
+        search.refresh(getattr(instance, '_search_recepie_ids', ()))
+        stats.attribute_deleted(instance)
+    elif not created:
+        search.refresh(instance.recepie_set.values_list('id', flat=True))
+    cache.bump_version(sender, instance.user_id)
+    # Recepie details nest tag & ingredient names
+    cache.bump_version(Recepie, instance.user_id)
+
+
+@receiver(m2m_changed, sender=RecepieTag)
+@receiver(m2m_changed, sender=RecepieIngredient)
+def recepie_attributes_changed(sender, instance, action, reverse, model,
+                               pk_set, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        # pk_set of a removal may hold ids that were never assigned
+        instance._removed_ids = stats.assigned_ids(
+            sender, instance, reverse, pk_set)
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        changed = pk_set if action == 'post_add' else instance._removed_ids
+        search.refresh([instance.pk] if not reverse else changed)
+        stats.relations_changed(sender, instance, reverse, changed,
+                                1 if action == 'post_add' else -1)
+        # assigned_only lists depend on which attributes are in use
+        attribute = type(instance) if reverse else model
+        cache.bump_version(attribute, instance.user_id)
+        cache.bump_version(Recepie, instance.user_id)
+
+
+@receiver(pre_save, sender=Recepie)
+def recepie_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    # None leaves the stats alone, False counts a new recepie
+    instance._stats_values = None
+    if not raw and (update_fields is None
+                    or {'price', 'minutes_to_deliver'} & set(update_fields)):
+        instance._stats_values = not instance._state.adding and (
+            stats.stored_values([instance.pk]).get(instance.pk) or False)
+
+
+@receiver(post_save, sender=Recepie)
+def recepie_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_stats_values', None)
+    if previous is not None:
+        delta = stats.Delta(instance.user_id).recepie(
+            instance.price, instance.minutes_to_deliver)
+        if previous:
+            delta.recepie(*previous, sign=-1)
+        delta.apply()
+    cache.bump_version(Recepie, instance.user_id)
+
+
+@receiver(pre_delete, sender=Recepie)
+def recepie_deleting(sender, instance, **kwargs):
+    # The through rows go without an m2m_changed signal
+    instance._stats_related = stats.related_ids([instance.pk])
+    instance._stats_values = stats.stored_values([instance.pk]).get(instance.pk)
+
+
+@receiver(post_delete, sender=Recepie)
+def recepie_deleted(sender, instance, **kwargs):
+    delta = stats.Delta(instance.user_id).recepie(
+        *(getattr(instance, '_stats_values', None) or
+          (instance.price, instance.minutes_to_deliver)), sign=-1)
+    for kind, ids in getattr(instance, '_stats_related', {}).items():
+        delta.related(kind, ids, -1)
+    delta.apply()
+    cache.bump_version(Recepie, instance.user_id)
+    cache.bump_version(Tag, instance.user_id)
+    cache.bump_version(Ingredient, instance.user_id)
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    # Deleting the recepies of the user counted them out again
+    RecepieStat.objects.filter(user_id=instance.pk).delete()
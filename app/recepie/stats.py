@@ -0,0 +1,250 @@
+"""Per user recepie statistics & facet counts
+
+``RecepieStat`` rows hold running aggregates of a user's recepies, keyed by
+``kind`` & ``value``:
+
+- ``recepies``, value 0: the number of recepies & the sum of their prices
+- ``minutes``, value the lower bound of a bucket: the recepies delivered in
+  that many minutes & the sum of their minutes
+- ``tag`` / ``ingredient``, value the id: the recepies using it
+
+``recepie.signals`` (and the bulk serializer) apply the changes of every
+write as a ``Delta``, so reading the stats never scans the recepies.
+``compute`` does, to check or rebuild the rows.
+
+Writes that send no signals, like ``QuerySet.update()`` or raw SQL, leave the
+stats behind: run ``manage.py recepie_stats --rebuild`` after them.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+
+from core.models import (Ingredient, Recepie, RecepieIngredient, RecepieStat,
+                         RecepieTag, Tag)
+
+
+RECEPIES = 'recepies'
+MINUTES = 'minutes'
+MINUTES_BUCKETS = (0, 15, 30, 60, 120)
+
+RELATIONS = {RecepieTag: ('tag', 'tag_id', Tag),
+             RecepieIngredient: ('ingredient', 'ingredient_id', Ingredient)}
+
+UPSERT_BATCH_SIZE = 100
+
+
+def bucket(minutes):
+    """Return the lower bound of the bucket of ``minutes``"""
+
+    return max(lower for lower in MINUTES_BUCKETS if lower <= minutes)
+
+
+class Delta:
+    """Changes to a user's stats, applied in one query per batch"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.changes = defaultdict(lambda: [0, Decimal(0)])
+
+    def _add(self, kind, value, count, total=0):
+        change = self.changes[kind, value]
+        change[0] += count
+        change[1] += total
+
+    def recepie(self, price, minutes, sign=1):
+        """Count (or with ``sign=-1`` uncount) a recepie"""
+
+        self._add(RECEPIES, 0, sign, sign * Decimal(str(price)))
+        self._add(MINUTES, bucket(minutes), sign, sign * minutes)
+        return self
+
+    def related(self, kind, ids, sign=1):
+        """Count recepies using the tags or ingredients ``ids``"""
+
+        for related_id in ids:
+            self._add(kind, related_id, sign)
+        return self
+
+    def apply(self):
+        """Add the changes to the stored rows, creating missing ones"""
+
+        rows = [(self.user_id, kind, value, count, total)
+                for (kind, value), (count, total) in self.changes.items()
+                if count or total]
+        self.changes.clear()
+        if not rows:
+            return
+
+        quote = connection.ops.quote_name
+        table = quote(RecepieStat._meta.db_table)
+        columns = ', '.join(quote(column) for column in
+                            ('user_id', 'kind', 'value', 'count', 'total'))
+        # ON CONFLICT is understood by both PostgreSQL & SQLite
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                batch = rows[start:start + UPSERT_BATCH_SIZE]
+                placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))
+                cursor.execute(
+                    f'INSERT INTO {table} ({columns}) VALUES {placeholders} '
+                    f'ON CONFLICT ({quote("user_id")}, {quote("kind")}, {quote("value")}) '
+                    f'DO UPDATE SET {quote("count")} = {table}.{quote("count")} + excluded.{quote("count")}, '
+                    f'{quote("total")} = {table}.{quote("total")} + excluded.{quote("total")}',
+                    [param for row in batch for param in row])
+
+
+def stored_values(recepie_ids):
+    """Return ``{id: (price, minutes)}`` of the recepies as stored
+
+    The rows stay locked until the transaction ends, so a concurrent write
+    can't change them between counting the stored values out & the new ones in.
+    """
+
+    rows = Recepie.objects.select_for_update().filter(
+        pk__in=recepie_ids).values_list('id', 'price', 'minutes_to_deliver')
+    return {pk: (price, minutes) for pk, price, minutes in rows}
+
+
+def related_ids(recepie_ids):
+    """Return the tag & ingredient ids of the recepies, read in one query"""
+
+    related = {'tag': [], 'ingredient': []}
+    tags = RecepieTag.objects.filter(recepie_id__in=recepie_ids).values_list(
+        Value('tag'), 'tag_id')
+    ingredients = RecepieIngredient.objects.filter(
+        recepie_id__in=recepie_ids).values_list(Value('ingredient'), 'ingredient_id')
+    for kind, related_id in tags.union(ingredients, all=True):
+        related[kind].append(related_id)
+    return related
+
+
+def assigned_ids(through, instance, reverse, pk_set=None):
+    """Return the ids on the other side of ``instance``'s through rows
+
+    Limited to ``pk_set`` when given, so ids that aren't assigned are left out.
+    """
+
+    _, column, _ = RELATIONS[through]
+    source, target = ('recepie_id', column) if not reverse else (column, 'recepie_id')
+    rows = through.objects.filter(**{source: instance.pk})
+    if pk_set is not None:
+        rows = rows.filter(**{f'{target}__in': pk_set})
+    return list(rows.values_list(target, flat=True))
+
+
+def relations_changed(through, instance, reverse, ids, sign):
+    """Count the through rows of ``instance`` added or removed"""
+
+    kind = RELATIONS[through][0]
+    related = ids if not reverse else [instance.pk] * len(ids)
+    Delta(instance.user_id).related(kind, related, sign).apply()
+
+
+def attribute_deleted(instance):
+    """Drop the facet of a deleted tag or ingredient"""
+
+    kind = {model: kind for kind, _, model in RELATIONS.values()}[type(instance)]
+    RecepieStat.objects.filter(
+        user_id=instance.user_id, kind=kind, value=instance.pk).delete()
+
+
+def compute(user_id):
+    """Aggregate the stats of a user from their recepies"""
+
+    stats = {}
+    recepies = Recepie.objects.filter(user_id=user_id)
+    totals = recepies.aggregate(count=Count('id'), total=Sum('price'))
+    if totals['count']:
+        stats[RECEPIES, 0] = (totals['count'], totals['total'])
+
+    buckets = Case(*[When(minutes_to_deliver__gte=lower, then=Value(lower))
+                     for lower in reversed(MINUTES_BUCKETS)],
+                   output_field=IntegerField())
+    rows = (recepies.order_by().annotate(bucket=buckets).values('bucket')
+            .annotate(count=Count('id'), total=Sum('minutes_to_deliver')))
+    for row in rows:
+        stats[MINUTES, row['bucket']] = (row['count'], Decimal(row['total']))
+
+    for through, (kind, column, _) in RELATIONS.items():
+        rows = (through.objects.filter(recepie__user_id=user_id).order_by()
+                .values(column).annotate(count=Count('id')))
+        for row in rows:
+            stats[kind, row[column]] = (row['count'], Decimal(0))
+    return stats
+
+
+def stored(user_id):
+    """Return the stats rows of a user that aren't empty"""
+
+    rows = RecepieStat.objects.filter(user_id=user_id).exclude(
+        count=0, total=0).values_list('kind', 'value', 'count', 'total')
+    return {(kind, value): (count, total) for kind, value, count, total in rows}
+
+
+def check(user_id):
+    """Return ``(kind, value, stored, expected)`` for every wrong row"""
+
+    expected, actual = compute(user_id), stored(user_id)
+    return [(kind, value, actual.get((kind, value)), expected.get((kind, value)))
+            for kind, value in sorted(expected.keys() | actual.keys())
+            if actual.get((kind, value)) != expected.get((kind, value))]
+
+
+def rebuild(user_id):
+    """Replace the stats rows of a user with freshly computed ones"""
+
+    with transaction.atomic():
+        RecepieStat.objects.filter(user_id=user_id).delete()
+        RecepieStat.objects.bulk_create(
+            RecepieStat(user_id=user_id, kind=kind, value=value,
+                        count=count, total=total)
+            for (kind, value), (count, total) in compute(user_id).items())
+
+
+def summary(user_id):
+    """Return the stats & facets of a user, read in two queries"""
+
+    rows = stored(user_id)
+    count, price_total = rows.get((RECEPIES, 0), (0, Decimal(0)))
+    minutes_total = sum(total for (kind, _), (_, total) in rows.items()
+                        if kind == MINUTES)
+
+    distribution = []
+    for index, lower in enumerate(MINUTES_BUCKETS):
+        upper = (MINUTES_BUCKETS[index + 1] - 1
+                 if index + 1 < len(MINUTES_BUCKETS) else None)
+        distribution.append({'min': lower, 'max': upper,
+                             'count': rows.get((MINUTES, lower), (0, 0))[0]})
+
+    facets = {kind: {value: used for (row_kind, value), (used, _) in rows.items()
+                     if row_kind == kind and used}
+              for kind, _, _ in RELATIONS.values()}
+    tags = Tag.objects.filter(id__in=facets['tag']).values_list(
+        Value('tag'), 'id', 'name')
+    ingredients = Ingredient.objects.filter(
+        id__in=facets['ingredient']).values_list(Value('ingredient'), 'id', 'name')
+    names = {}
+    if facets['tag'] or facets['ingredient']:
+        names = {(kind, pk): name
+                 for kind, pk, name in tags.union(ingredients, all=True)}
+
+    def facet(kind):
+        items = [{'id': pk, 'name': names[kind, pk], 'recepies': used}
+                 for pk, used in facets[kind].items() if (kind, pk) in names]
+        return sorted(items, key=lambda item: (-item['recepies'], item['name'], item['id']))
+
+    return {
+        'recepies': count,
+        'price': {
+            'total': f'{price_total:.2f}',
+            'average': f'{price_total / count:.2f}' if count else None,
+        },
+        'minutes_to_deliver': {
+            'average': round(float(minutes_total) / count, 1) if count else None,
+            'distribution': distribution,
+        },
+        'tags': facet('tag'),
+        'ingredients': facet('ingredient'),
+    }
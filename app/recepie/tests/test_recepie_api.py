@@ -1,26 +1,41 @@
+import hashlib
 import logging
 import os
+import shutil
 import tempfile
+from unittest.mock import patch
 from PIL import Image
 
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
 from django.core.handlers.base import logger
-from django.test.utils import tag
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import tag, override_settings
 from django.urls import reverse
+from django.utils.http import http_date
 from django.test import TestCase
 
 from rest_framework import serializers, status
 from rest_framework.test import APIClient
 
+from core.testing import QueryBudgetMixin, query_budget
+
 from core.models import Recepie, Tag, Ingredient
-from recepie.serializers import RecepieSerializer, RecepieDetailSerializer
+from recepie.images import VARIANTS, _run_in_worker, generate_variants
+from recepie.pagination import RecepieCursorPagination
+from recepie.views import RecepieViewSet
+from recepie.serializers import (RecepieSerializer, RecepieDetailSerializer,
+                                 BulkRecepieListSerializer)
 
 
 logger = logging.getLogger(__file__)
 
 
 RECEPIE_URL = reverse('recepie:recepie-list')
+BULK_URL = reverse('recepie:recepie-bulk')
 
 
 def image_upload_url(recepie_id):
@@ -69,7 +84,7 @@ class PublicRecepieAPITests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateRecepieAPITests(TestCase):
+class PrivateRecepieAPITests(QueryBudgetMixin, TestCase):
     """Test private APIs"""
 
     def setUp(self) -> None:
@@ -78,6 +93,7 @@ class PrivateRecepieAPITests(TestCase):
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
+    @query_budget(3)
     def test_retrive_recepie_list(self):
         """Test list of recepies retrival is successful """
 
@@ -89,7 +105,7 @@ class PrivateRecepieAPITests(TestCase):
         serializer = RecepieSerializer(recepies, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_recepies_limited_to_user(self):
         """Test user can retrieve only their recepies """
@@ -104,9 +120,10 @@ class PrivateRecepieAPITests(TestCase):
         serializer = RecepieSerializer(recepies, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
+    @query_budget(3)
     def test_view_recepie_detail(self):
         """Test viewing a recepie details"""
 
@@ -119,6 +136,302 @@ class PrivateRecepieAPITests(TestCase):
         serializer = RecepieDetailSerializer(recepie)
         self.assertEqual(response.data, serializer.data)
 
+    def _add_related_recepies(self, count):
+        """Create recepies with a tag & an ingredient each"""
+
+        for index in range(count):
+            recepie = sample_recepie(self.user, title=f'Recepie {index}')
+            recepie.tags.add(sample_tag(self.user, name=f'Tag {index}'))
+            recepie.ingredients.add(
+                sample_ingredient(self.user, name=f'Ingredient {index}'))
+
+    def test_recepie_list_query_count_is_constant(self):
+        """Test listing recepies doesn't query per recepie"""
+
+        self.assertQueriesDontScale(
+            lambda count: self._add_related_recepies(
+                count - Recepie.objects.count()),
+            lambda: self.client.get(RECEPIE_URL))
+
+    def test_recepie_detail_queries_dont_scale(self):
+        """Test recepie detail doesn't query per tag or ingredient"""
+
+        recepie = sample_recepie(self.user)
+
+        def grow(count):
+            for index in range(recepie.tags.count(), count):
+                recepie.tags.add(sample_tag(self.user, name=f'Tag {index}'))
+                recepie.ingredients.add(
+                    sample_ingredient(self.user, name=f'Ingredient {index}'))
+
+        self.assertQueriesDontScale(
+            grow, lambda: self.client.get(detail_url(recepie.id)))
+
+    def test_create_recepie_queries_dont_scale(self):
+        """Test creating a recepie doesn't query per tag"""
+
+        tags = []
+
+        def grow(count):
+            tags.extend(sample_tag(self.user, name=f'Tag {index}')
+                        for index in range(len(tags), count))
+
+        self.assertQueriesDontScale(grow, lambda: self.client.post(
+            RECEPIE_URL, {'title': 'Cake', 'minutes_to_deliver': 60,
+                          'price': Decimal(300), 'ingredients': [],
+                          'tags': [tag.id for tag in tags]}, format='json'))
+
+    def test_recepie_list_paginated_by_cursor(self):
+        """Test following the next cursor walks through every recepie"""
+
+        recepies = [sample_recepie(self.user, title=f'Recepie {index}')
+                    for index in range(5)]
+
+        seen = []
+        response = self.client.get(RECEPIE_URL, {'page_size': 2})
+        while True:
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(seen, [recepie.id for recepie in reversed(recepies)])
+
+    def test_recepie_list_page_size_is_bounded(self):
+        """Test clients can't request pages over the maximum size"""
+
+        for index in range(3):
+            sample_recepie(self.user, title=f'Recepie {index}')
+
+        with patch.object(RecepieCursorPagination, 'max_page_size', 2):
+            response = self.client.get(RECEPIE_URL, {'page_size': 1000})
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def _walk(self, params, backwards=False):
+        """Follow the cursors of a listing and return the ids seen"""
+
+        seen = []
+        response = self.client.get(RECEPIE_URL, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        if backwards:
+            seen = [item['id'] for item in response.data['results']]
+            while response.data['previous']:
+                response = self.client.get(response.data['previous'])
+                seen = [item['id'] for item in response.data['results']] + seen
+        return seen
+
+    def test_recepie_list_filtered_by_ranges(self):
+        """Test price & minutes ranges combine with the user filter"""
+
+        quick_cheap = sample_recepie(self.user, price=5, minutes_to_deliver=10)
+        sample_recepie(self.user, price=50, minutes_to_deliver=10)
+        sample_recepie(self.user, price=5, minutes_to_deliver=90)
+        user_2 = get_user_model().objects.create_user(
+            email='admin@example.com', password='admin12345')
+        sample_recepie(user_2, price=5, minutes_to_deliver=10)
+
+        response = self.client.get(RECEPIE_URL, {
+            'price_min': '1', 'price_max': '9.99', 'minutes_max': 15})
+
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [quick_cheap.id])
+
+    def test_recepie_list_invalid_ranges(self):
+        """Test malformed range & ordering parameters are rejected"""
+
+        for params in ({'price_min': 'cheap'}, {'minutes_max': -1},
+                       {'ordering': 'title'}, {'ordering': '--price'}):
+            response = self.client.get(RECEPIE_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(list(params)[0], response.data)
+
+    def test_recepie_list_ordered_by_price(self):
+        """Test sorting by price pages through ties without repeats"""
+
+        prices = [7, 3, 3, 3, 9, 3, 1]
+        recepies = [sample_recepie(self.user, price=price) for price in prices]
+        expected = [recepie.id for recepie in sorted(
+            recepies, key=lambda recepie: (recepie.price, recepie.id))]
+
+        self.assertEqual(self._walk({'ordering': 'price', 'page_size': 2}),
+                         expected)
+        self.assertEqual(self._walk({'ordering': '-price', 'page_size': 2}),
+                         expected[::-1])
+        self.assertEqual(self._walk({'ordering': 'price', 'page_size': 3},
+                                    backwards=True), expected)
+
+    def test_recepie_list_ordered_by_minutes_within_range(self):
+        """Test sorting & ranges apply together on every page"""
+
+        recepies = [sample_recepie(self.user, minutes_to_deliver=minutes)
+                    for minutes in (40, 5, 25, 25, 60, 15)]
+        expected = [recepie.id for recepie in sorted(
+            recepies, key=lambda recepie: (-recepie.minutes_to_deliver, -recepie.id))
+            if 10 <= recepie.minutes_to_deliver <= 40]
+
+        self.assertEqual(self._walk({
+            'ordering': '-minutes_to_deliver', 'minutes_min': 10,
+            'minutes_max': 40, 'page_size': 1}), expected)
+
+    def test_recepie_list_invalid_cursor(self):
+        """Test a tampered cursor is answered with 404"""
+
+        response = self.client.get(RECEPIE_URL, {'cursor': 'cD1ub3Rqc29u'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recepie_list_sparse_fields(self):
+        """Test ?fields= prunes the response & the columns read"""
+
+        recepie = sample_recepie(self.user, title='Cake')
+        recepie.tags.add(sample_tag(self.user))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECEPIE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(response.data['results'],
+                         [{'id': recepie.id, 'title': 'Cake'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"price"', queries[0]['sql'])
+
+    def test_sparse_fields_keep_ordering_columns(self):
+        """Test serializing a page ordered by an unrequested column"""
+
+        for index in range(3):
+            sample_recepie(self.user, title=f'Recepie {index}', price=f'{index}.00')
+
+        with self.assertNumQueries(1), \
+                patch.object(RecepieViewSet, 'row_list', False):
+            response = self.client.get(RECEPIE_URL, {
+                'fields': 'id,title', 'ordering': 'price', 'page_size': 2})
+
+        self.assertEqual([item['title'] for item in response.data['results']],
+                         ['Recepie 0', 'Recepie 1'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_recepie_list_skips_unrequested_relations(self):
+        """Test only the requested relations are prefetched"""
+
+        recepie = sample_recepie(self.user)
+        tag = sample_tag(self.user)
+        recepie.tags.add(tag)
+        recepie.ingredients.add(sample_ingredient(self.user))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(RECEPIE_URL, {'fields': 'id,tags'})
+
+        self.assertEqual(response.data['results'],
+                         [{'id': recepie.id, 'tags': [tag.id]}])
+
+    def test_recepie_list_expand_relations(self):
+        """Test ?expand= nests the objects of a relation"""
+
+        recepie = sample_recepie(self.user)
+        tag = sample_tag(self.user, name='Vegan')
+        ingredient = sample_ingredient(self.user)
+        recepie.tags.add(tag)
+        recepie.ingredients.add(ingredient)
+
+        response = self.client.get(RECEPIE_URL, {'expand': 'tags'})
+
+        item = response.data['results'][0]
+        self.assertEqual(item['tags'], [{'id': tag.id, 'name': 'Vegan'}])
+        self.assertEqual(item['ingredients'], [ingredient.id])
+
+    def test_recepie_detail_sparse_fields(self):
+        """Test nested relations keep their fields in a sparse detail"""
+
+        recepie = sample_recepie(self.user, title='Cake')
+        tag = sample_tag(self.user, name='Vegan')
+        recepie.tags.add(tag)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(detail_url(recepie.id),
+                                       {'fields': 'title,tags'})
+
+        self.assertEqual(response.data, {
+            'title': 'Cake', 'tags': [{'id': tag.id, 'name': 'Vegan'}]})
+
+    def test_sparse_fields_ignored_on_writes(self):
+        """Test responses to writes always have every field"""
+
+        response = self.client.post(
+            RECEPIE_URL + '?fields=id', {'title': 'Cake', 'minutes_to_deliver': 5,
+                                         'price': '5.00'})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('title', response.data)
+
+    def test_unknown_sparse_fields(self):
+        """Test unknown fields & relations, or no fields, are rejected"""
+
+        for params in ({'fields': 'id,secret'}, {'expand': 'title'},
+                       {'fields': ''}, {'fields': ' , '}):
+            response = self.client.get(RECEPIE_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(list(params)[0], response.data)
+
+    def test_row_list_matches_serializer(self):
+        """Test lists built from rows render the serializer's exact bytes"""
+
+        tags = [sample_tag(self.user, name=f'Tag {index}') for index in range(3)]
+        ingredient = sample_ingredient(self.user)
+        for index in range(4):
+            recepie = sample_recepie(
+                self.user, title=f'Recepie {index}', price=f'{index}.5',
+                link='x' * index, image_variants={'thumb': f'{index}.webp'} if index else {})
+            recepie.tags.add(*reversed(tags[:index]))
+            if index % 2:
+                recepie.ingredients.add(ingredient)
+
+        for params in ({}, {'page_size': 2, 'ordering': 'price'},
+                       {'fields': 'id,price,tags'}, {'price_max': '2'}):
+            cache.clear()
+            fast = self.client.get(RECEPIE_URL, params)
+            cache.clear()
+            with patch.object(RecepieViewSet, 'row_list', False):
+                slow = self.client.get(RECEPIE_URL, params)
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+            self.assertEqual(fast.content, slow.content)
+
+    @query_budget(2)
+    def test_row_list_queries_dont_scale(self):
+        """Test row lists read relations with one query"""
+
+        def grow(count):
+            tag = sample_tag(self.user)
+            for _ in range(Recepie.objects.count(), count):
+                recepie = sample_recepie(self.user)
+                recepie.tags.add(tag)
+                recepie.ingredients.add(sample_ingredient(self.user))
+
+        self.assertQueriesDontScale(grow, lambda: self.client.get(
+            RECEPIE_URL, {'page_size': 200}))
+
+    def test_recepie_detail_query_count(self):
+        """Test recepie detail loads tags & ingredients in one query each"""
+
+        recepie = sample_recepie(self.user)
+        for index in range(5):
+            recepie.tags.add(sample_tag(self.user, name=f'Tag {index}'))
+            recepie.ingredients.add(
+                sample_ingredient(self.user, name=f'Ingredient {index}'))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(detail_url(recepie.id))
+
+        self.assertEqual(len(response.data['tags']), 5)
+        self.assertEqual(len(response.data['ingredients']), 5)
+
+    @query_budget(6)
     def test_create_basic_recepie(self):
         """Test create basic recepie"""
 
@@ -132,6 +445,7 @@ class PrivateRecepieAPITests(TestCase):
         response = self.client.post(RECEPIE_URL, payload)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    @query_budget(12)
     def test_create_recepie_with_tags(self):
         """Test create recepie with tags"""
 
@@ -156,6 +470,7 @@ class PrivateRecepieAPITests(TestCase):
         self.assertIn(tag1, tags)
         self.assertIn(tag2, tags)
 
+    @query_budget(12)
     def test_create_recepie_with_ingredients(self):
         """Test create recepie with ingredients"""
 
@@ -180,6 +495,75 @@ class PrivateRecepieAPITests(TestCase):
         self.assertIn(ing1, ings)
         self.assertIn(ing2, ings)
 
+    def test_create_recepie_validates_ingredients_in_one_query(self):
+        """Test every ingredient id is resolved by a single query"""
+
+        ingredients = [sample_ingredient(self.user, name=f'Ingredient {index}')
+                       for index in range(40)]
+        payload = {
+            'title': 'Chocolate Cake',
+            'minutes_to_deliver': 60,
+            'price': Decimal(300),
+            'tags': [],
+            'ingredients': [ingredient.id for ingredient in ingredients]
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(RECEPIE_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        lookups = [query for query in queries
+                   if '"core_ingredient"."user_id" =' in query['sql']]
+        self.assertEqual(len(lookups), 1)
+
+    def test_create_recepie_with_other_users_tag(self):
+        """Test tags of other users can't be assigned"""
+
+        user_2 = get_user_model().objects.create_user(
+            email='admin@example.com', password='admin12345')
+        tag = sample_tag(user_2)
+        payload = {
+            'title': 'Chocolate Cake',
+            'minutes_to_deliver': 60,
+            'price': Decimal(300),
+            'tags': [tag.id],
+            'ingredients': []
+        }
+
+        response = self.client.post(RECEPIE_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recepie.objects.exists())
+
+    def test_create_recepie_reports_all_missing_ids(self):
+        """Test every missing id is reported in one error"""
+
+        tag = sample_tag(self.user)
+        payload = {
+            'title': 'Chocolate Cake',
+            'minutes_to_deliver': 60,
+            'price': Decimal(300),
+            'tags': [tag.id, 9998, 9999],
+            'ingredients': []
+        }
+
+        response = self.client.post(RECEPIE_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('9998', response.data['tags'][0])
+        self.assertIn('9999', response.data['tags'][0])
+
+    def test_update_recepie_rejects_invalid_pk(self):
+        """Test updating tags with a malformed id is rejected"""
+
+        recepie = sample_recepie(user=self.user)
+
+        response = self.client.patch(
+            detail_url(recepie.id), {'tags': ['abc']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @query_budget(18)
     def test_partial_update_recepie(self):
         """Test updating a recepie with patch"""
 
@@ -200,6 +584,7 @@ class PrivateRecepieAPITests(TestCase):
         self.assertEqual(tags.count(), 1)
         self.assertIn(new_tag, tags)
 
+    @query_budget(14)
     def test_full_update_recepie(self):
         """Test full updating a recepie """
 
@@ -222,6 +607,104 @@ class PrivateRecepieAPITests(TestCase):
         self.assertEqual(recepie.tags.count(), 0)
 
 
+class ConditionalRecepieAPITests(TestCase):
+    """Test ETag & Last-Modified handling of recepie APIs"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recepie = sample_recepie(self.user)
+
+    def test_list_has_validators(self):
+        """Test recepie lists carry an ETag & the time of the latest update"""
+        cache.clear()
+
+        response = self.client.get(RECEPIE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertEqual(response['Last-Modified'],
+                         http_date(int(self.recepie.updated_at.timestamp())))
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_delete_moves_last_modified(self):
+        """Test deleting a recepie moves Last-Modified past the last update"""
+        cache.clear()
+        sample_recepie(self.user, title='Kept')
+        self.client.get(RECEPIE_URL)
+
+        with patch('recepie.cache.time.time_ns',
+                   return_value=(int(self.recepie.updated_at.timestamp()) + 60)
+                   * 10 ** 9):
+            self.recepie.delete()
+        response = self.client.get(RECEPIE_URL)
+
+        self.assertEqual(
+            response['Last-Modified'],
+            http_date(int(self.recepie.updated_at.timestamp()) + 60))
+
+    def test_unchanged_list_not_modified(self):
+        """Test a matching ETag gets a 304 without querying"""
+
+        etag = self.client.get(RECEPIE_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(RECEPIE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_unchanged_detail_not_modified(self):
+        """Test a recepie detail is validated by its ETag"""
+
+        url = detail_url(self.recepie.id)
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_modified_since_ignored(self):
+        """Test a change within the same second isn't hidden by a 304"""
+
+        self.client.get(RECEPIE_URL)
+        self.recepie.title = 'Updated'
+        self.recepie.save()
+
+        response = self.client.get(
+            RECEPIE_URL, HTTP_IF_MODIFIED_SINCE=http_date())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['title'], 'Updated')
+
+    def test_changes_invalidate_etag(self):
+        """Test updating recepies or their tags changes the ETag"""
+
+        etag = self.client.get(RECEPIE_URL)['ETag']
+
+        self.recepie.title = 'Updated'
+        self.recepie.save()
+        response = self.client.get(RECEPIE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        self.recepie.tags.add(sample_tag(self.user))
+        response = self.client.get(RECEPIE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_differs_per_query(self):
+        """Test different pages & filters get different ETags"""
+
+        first = self.client.get(RECEPIE_URL)['ETag']
+        second = self.client.get(RECEPIE_URL, {'page_size': 1})['ETag']
+
+        self.assertNotEqual(first, second)
+
+
 class RecepieImageUploadTests(TestCase):
     """Test to test image uploading"""
 
@@ -231,9 +714,19 @@ class RecepieImageUploadTests(TestCase):
             email='test@example.com', password='admin12345')
         self.client.force_authenticate(self.user)
         self.recepie = sample_recepie(self.user)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
 
-    def tearDown(self) -> None:
-        self.recepie.image.delete()
+    def _upload(self, size=(10, 10)):
+        url = image_upload_url(self.recepie.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+            image = Image.new('RGB', size)
+            image.save(ntf, format='PNG')
+            ntf.seek(0)
+            return self.client.post(url, {'image': ntf}, format='multipart')
 
     def test_upload_image_to_recepie(self):
         """Test uploading image to recepie """
@@ -251,6 +744,57 @@ class RecepieImageUploadTests(TestCase):
         self.assertIn('image', response.data)
         self.assertTrue(os.path.exists(self.recepie.image.path))
 
+    def test_upload_schedules_variants(self):
+        """Test variants are rendered after the upload, not during it"""
+
+        with patch('recepie.images._get_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._upload()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['image_variants'], {})
+        executor.return_value.submit.assert_called_once_with(
+            _run_in_worker, self.recepie.id)
+
+    @override_settings(RECEPIE_IMAGE_EAGER=True)
+    def test_upload_renders_variants(self):
+        """Test resized variants are stored & recorded on the recepie"""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(size=(1200, 800))
+
+        self.recepie.refresh_from_db()
+        self.assertEqual(set(self.recepie.image_variants), set(VARIANTS))
+        storage = self.recepie.image.storage
+        for label, path in self.recepie.image_variants.items():
+            with Image.open(storage.path(path)) as variant:
+                self.assertLessEqual(variant.width, VARIANTS[label][0])
+                self.assertLessEqual(variant.height, VARIANTS[label][1])
+                self.assertEqual(variant.format, 'JPEG')
+
+        response = self.client.get(RECEPIE_URL)
+        self.assertEqual(response.data['results'][0]['image_variants'],
+                         self.recepie.image_variants)
+
+    def test_variants_of_replaced_image_discarded(self):
+        """Test variants rendered for an outdated image aren't recorded"""
+
+        self._upload()
+        self.recepie.refresh_from_db()
+
+        def replace_while_rendering(image, size):
+            Recepie.objects.filter(pk=self.recepie.id).update(image='other.png')
+            return ContentFile(b'variant')
+
+        with patch('recepie.images._render', side_effect=replace_while_rendering):
+            generate_variants(self.recepie.id)
+
+        digest = hashlib.sha256(b'variant').hexdigest()
+        storage = self.recepie.image.storage
+        self.assertFalse(storage.exists(f'blobs/{digest[:2]}/{digest}.jpg'))
+        self.recepie.refresh_from_db()
+        self.assertEqual(self.recepie.image_variants, {})
+
     def test_upload_bad_image(self):
         """Test uploading bad image"""
 
@@ -281,9 +825,9 @@ class RecepieImageUploadTests(TestCase):
         serializer2 = RecepieSerializer(recepie2)
         serializer3 = RecepieSerializer(recepie3)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertIn(serializer2.data, response.data)
-        self.assertIn(serializer3.data, response.data)
+        self.assertIn(serializer1.data, response.data['results'])
+        self.assertIn(serializer2.data, response.data['results'])
+        self.assertNotIn(serializer3.data, response.data['results'])
 
     def test_filter_recepies_by_ingredients(self):
         """Test recepies are filtered by ingredients """
@@ -307,6 +851,384 @@ class RecepieImageUploadTests(TestCase):
         serializer2 = RecepieSerializer(recepie2)
         serializer3 = RecepieSerializer(recepie3)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertIn(serializer2.data, response.data)
-        self.assertIn(serializer3.data, response.data)
+        self.assertIn(serializer1.data, response.data['results'])
+        self.assertIn(serializer2.data, response.data['results'])
+        self.assertNotIn(serializer3.data, response.data['results'])
+
+    def test_filter_recepies_matching_all_tags(self):
+        """Test recepies are filtered by all the given tags"""
+
+        recepie1 = sample_recepie(self.user, title='Biryani')
+        recepie2 = sample_recepie(self.user, title='Cucumber')
+
+        tag1 = sample_tag(self.user, name='Vegan')
+        tag2 = sample_tag(self.user, name='Vegetarian')
+
+        recepie1.tags.add(tag1, tag2)
+        recepie2.tags.add(tag1)
+
+        response = self.client.get(
+            RECEPIE_URL, {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [RecepieSerializer(recepie1).data])
+
+    def test_filter_recepies_results_are_unique(self):
+        """Test recepies matching many ids are returned once"""
+
+        recepie = sample_recepie(self.user, title='Biryani')
+        ingredient1 = sample_ingredient(self.user, name='Rice')
+        ingredient2 = sample_ingredient(self.user, name='Chilli')
+        recepie.ingredients.add(ingredient1, ingredient2)
+
+        response = self.client.get(
+            RECEPIE_URL, {'ingredient': f'{ingredient1.id},{ingredient2.id}'})
+
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_filter_recepies_by_tags_and_ingredients(self):
+        """Test tag & ingredient filters are combined"""
+
+        recepie1 = sample_recepie(self.user, title='Biryani')
+        recepie2 = sample_recepie(self.user, title='Fish')
+        tag = sample_tag(self.user, name='Dinner')
+        ingredient = sample_ingredient(self.user, name='Rice')
+        recepie1.tags.add(tag)
+        recepie1.ingredients.add(ingredient)
+        recepie2.tags.add(tag)
+
+        response = self.client.get(
+            RECEPIE_URL, {'tags': tag.id, 'ingredient': ingredient.id})
+
+        self.assertEqual(response.data['results'], [RecepieSerializer(recepie1).data])
+
+    def test_filter_recepies_invalid_ids(self):
+        """Test filtering with invalid ids is rejected"""
+
+        response = self.client.get(RECEPIE_URL, {'tags': 'vegan'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_recepies_invalid_match(self):
+        """Test filtering with an unknown match mode is rejected"""
+
+        response = self.client.get(RECEPIE_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkRecepieAPITests(QueryBudgetMixin, TestCase):
+    """Test creating, updating & deleting many recepies at once"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(self.user)
+        self.ingredient = sample_ingredient(self.user)
+
+    def _payload(self, count):
+        return [{'title': f'Recepie {index}', 'minutes_to_deliver': 10,
+                 'price': '5.00', 'tags': [self.tag.id],
+                 'ingredients': [self.ingredient.id]}
+                for index in range(count)]
+
+    def test_bulk_create_recepies(self):
+        """Test recepies & their relations are created in bulk"""
+
+        response = self.client.post(
+            BULK_URL, self._payload(3), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        recepies = Recepie.objects.filter(user=self.user)
+        self.assertEqual(recepies.count(), 3)
+        for recepie in recepies:
+            self.assertEqual(list(recepie.tags.all()), [self.tag])
+            self.assertEqual(list(recepie.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_validates_relations_once(self):
+        """Test related ids are checked with one query per relation"""
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(BULK_URL, self._payload(2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(BULK_URL, self._payload(20), format='json')
+
+        def lookups(queries):
+            return [query for query in queries
+                    if '"core_tag"."user_id"' in query['sql']
+                    or '"core_ingredient"."user_id"' in query['sql']]
+
+        self.assertEqual(len(lookups(small)), 2)
+        self.assertEqual(len(lookups(large)), 2)
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test invalid items are reported and nothing is created"""
+
+        user_2 = get_user_model().objects.create_user(
+            email='admin@example.com', password='admin12345')
+        other_tag = sample_tag(user_2)
+        payload = self._payload(3)
+        payload[1]['tags'] = [other_tag.id]
+        payload[2]['title'] = ''
+
+        response = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('tags', response.data[1])
+        self.assertIn('title', response.data[2])
+        self.assertFalse(Recepie.objects.exists())
+
+    def test_bulk_create_item_limit(self):
+        """Test oversized bulk requests are rejected"""
+
+        with patch.object(BulkRecepieListSerializer, 'max_items', 2):
+            response = self.client.post(
+                BULK_URL, self._payload(3), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_recepies(self):
+        """Test recepies are partially updated in bulk"""
+
+        recepie1 = sample_recepie(self.user, title='First')
+        recepie1.tags.add(self.tag)
+        recepie2 = sample_recepie(self.user, title='Second')
+        new_tag = sample_tag(self.user, name='New tag')
+        payload = [{'id': recepie1.id, 'title': 'Updated', 'tags': [new_tag.id]},
+                   {'id': recepie2.id, 'price': '9.99'}]
+
+        response = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recepie1.refresh_from_db()
+        recepie2.refresh_from_db()
+        self.assertEqual(recepie1.title, 'Updated')
+        self.assertEqual(list(recepie1.tags.all()), [new_tag])
+        self.assertEqual(recepie2.title, 'Second')
+        self.assertEqual(recepie2.price, Decimal('9.99'))
+
+    def test_bulk_update_other_users_recepie(self):
+        """Test recepies of other users can't be updated"""
+
+        user_2 = get_user_model().objects.create_user(
+            email='admin@example.com', password='admin12345')
+        recepie = sample_recepie(user_2, title='Theirs')
+
+        response = self.client.patch(
+            BULK_URL, [{'id': recepie.id, 'title': 'Mine'}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data[0])
+        recepie.refresh_from_db()
+        self.assertEqual(recepie.title, 'Theirs')
+
+    def test_bulk_writes_ignore_image_variants(self):
+        """Test image variants can't be written through bulk requests"""
+
+        payload = self._payload(1)
+        payload[0]['image_variants'] = {'thumb': '../../etc/passwd'}
+        response = self.client.post(BULK_URL, payload, format='json')
+        recepie = Recepie.objects.get(id=response.data[0]['id'])
+        self.assertEqual(recepie.image_variants, {})
+
+        self.client.patch(BULK_URL, [{'id': recepie.id, 'image_variants': 'x'}],
+                          format='json')
+        recepie.refresh_from_db()
+        self.assertEqual(recepie.image_variants, {})
+
+        response = self.client.delete(detail_url(recepie.id))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_bulk_update_duplicate_ids(self):
+        """Test listing a recepie twice is reported per item"""
+
+        recepie = sample_recepie(self.user)
+
+        response = self.client.patch(BULK_URL, [
+            {'id': recepie.id, 'tags': [self.tag.id]},
+            {'id': recepie.id, 'tags': [self.tag.id]}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data[0])
+        self.assertIn('id', response.data[1])
+
+    def test_bulk_create_invalid_relation_ids(self):
+        """Test malformed related ids get the field's own errors"""
+
+        payload = self._payload(2)
+        payload[0]['tags'] = ['abc']
+        payload[1]['ingredients'] = [self.ingredient.id + 100]
+
+        response = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Incorrect type', str(response.data[0]['tags']))
+        self.assertIn('does not exist', str(response.data[1]['ingredients']))
+
+    def test_bulk_delete_recepies(self):
+        """Test only the user's listed recepies are deleted"""
+
+        recepie1 = sample_recepie(self.user)
+        recepie2 = sample_recepie(self.user)
+        user_2 = get_user_model().objects.create_user(
+            email='admin@example.com', password='admin12345')
+        other = sample_recepie(user_2)
+
+        response = self.client.delete(
+            BULK_URL, [recepie1.id, other.id], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Recepie.objects.filter(user=self.user)),
+                         [recepie2])
+        self.assertTrue(Recepie.objects.filter(id=other.id).exists())
+
+    def test_bulk_delete_queries_dont_scale(self):
+        """Test bulk deletes don't query per recepie"""
+
+        def grow(count):
+            for index in range(Recepie.objects.count(), count):
+                recepie = sample_recepie(self.user, title=f'Recepie {index}')
+                recepie.tags.add(self.tag)
+                recepie.ingredients.add(self.ingredient)
+
+        self.assertQueriesDontScale(grow, lambda: self.client.delete(
+            BULK_URL, list(Recepie.objects.values_list('id', flat=True)),
+            format='json'), sizes=(5, 50))
+        self.assertFalse(Recepie.objects.exists())
+
+
+SEARCH_URL = reverse('recepie:recepie-search')
+
+
+class RecepieSearchAPITests(QueryBudgetMixin, TestCase):
+    """Test searching recepies by title, tag & ingredient names"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _search(self, query, **params):
+        response = self.client.get(SEARCH_URL, {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_title_ranked_above_relations(self):
+        """Test title matches rank above tag & ingredient matches"""
+
+        by_tag = sample_recepie(self.user, title='Cake')
+        by_tag.tags.add(sample_tag(self.user, name='Chocolate'))
+        by_ingredient = sample_recepie(self.user, title='Shake')
+        by_ingredient.ingredients.add(sample_ingredient(self.user, name='Chocolate'))
+        by_title = sample_recepie(self.user, title='Chocolate Cake')
+        sample_recepie(self.user, title='Biryani')
+
+        self.assertEqual(self._search('chocolate'),
+                         [by_title.id, by_ingredient.id, by_tag.id])
+
+    def test_search_fuzzy(self):
+        """Test typos & prefixes still match"""
+
+        recepie = sample_recepie(self.user, title='Chocolate Cake')
+
+        self.assertEqual(self._search('choclate'), [recepie.id])
+        self.assertEqual(self._search('choco'), [recepie.id])
+        self.assertEqual(self._search('pizza'), [])
+
+    def test_search_limited_to_user_and_filters(self):
+        """Test other users' recepies & filtered out ones aren't returned"""
+
+        user_2 = get_user_model().objects.create_user(
+            email='admin@example.com', password='admin12345')
+        sample_recepie(user_2, title='Fish Curry')
+        tag = sample_tag(self.user, name='Dinner')
+        dinner = sample_recepie(self.user, title='Fish Fry')
+        dinner.tags.add(tag)
+        sample_recepie(self.user, title='Fish Soup')
+
+        self.assertEqual(len(self._search('fish')), 2)
+        self.assertEqual(self._search('fish', tags=tag.id), [dinner.id])
+
+    def test_search_paginated(self):
+        """Test search results are paged by cursor, best match first"""
+
+        best = sample_recepie(self.user, title='Fish')
+        tag = sample_tag(self.user, name='Fish')
+        others = [sample_recepie(self.user, title=f'Curry {index}')
+                  for index in range(2)]
+        for recepie in others:
+            recepie.tags.add(tag)
+
+        response = self.client.get(SEARCH_URL, {'q': 'fish', 'page_size': 2})
+        first = [item['id'] for item in response.data['results']]
+        response = self.client.get(response.data['next'])
+        second = [item['id'] for item in response.data['results']]
+
+        self.assertEqual(first[0], best.id)
+        self.assertCountEqual(first + second, [best.id] + [o.id for o in others])
+        self.assertIsNone(response.data['next'])
+
+    def test_search_exact_hits_skip_near_misses(self):
+        """Test typos & prefixes aren't matched when a term matches exactly"""
+
+        exact = sample_recepie(self.user, title='Tag1 Cake')
+        for name in ('Tag0 Cake', 'Tag2 Cake'):
+            sample_recepie(self.user, title='Cake').tags.add(
+                sample_tag(self.user, name=name))
+
+        self.assertEqual(self._search('tag1'), [exact.id])
+        self.assertEqual(len(self._search('tag')), 3)
+
+    def test_search_text_follows_relations(self):
+        """Test adding, renaming & deleting tags updates the search text"""
+
+        recepie = sample_recepie(self.user, title='Cake')
+        tag = sample_tag(self.user, name='Vegan')
+        ingredient = sample_ingredient(self.user, name='Oats')
+
+        recepie.tags.add(tag)
+        recepie.ingredients.add(ingredient)
+        self.assertEqual(self._search('vegan'), [recepie.id])
+
+        tag.name = 'Gluten free'
+        tag.save()
+        self.assertEqual(self._search('vegan'), [])
+        self.assertEqual(self._search('gluten'), [recepie.id])
+
+        tag.delete()
+        ingredient.recepie_set.clear()
+        recepie.refresh_from_db()
+        self.assertEqual(recepie.search_text, '')
+
+    def test_bulk_create_sets_search_text(self):
+        """Test recepies created in bulk are searchable"""
+
+        tag = sample_tag(self.user, name='Breakfast')
+        self.client.post(BULK_URL, [
+            {'title': 'Pancakes', 'minutes_to_deliver': 10, 'price': '4.00',
+             'tags': [tag.id], 'ingredients': []}], format='json')
+
+        self.assertEqual(len(self._search('breakfast')), 1)
+
+    def test_search_index_reused(self):
+        """Test unchanged recepies are searched without rebuilding the index"""
+
+        for index in range(5):
+            sample_recepie(self.user, title=f'Curry {index}')
+        self._search('curry')
+
+        with self.assertMaxQueries(4):
+            self._search('curry')
+
+    def test_search_requires_query(self):
+        """Test an empty query is rejected"""
+
+        response = self.client.get(SEARCH_URL, {'q': ' '})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
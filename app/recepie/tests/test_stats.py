@@ -0,0 +1,232 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recepie, RecepieStat, Tag
+from core.testing import QueryBudgetMixin
+from recepie import stats
+
+
+STATS_URL = reverse('recepie:recepie-stats')
+BULK_URL = reverse('recepie:recepie-bulk')
+
+
+def sample_recepie(user, **params):
+    """Create and return a sample recepie"""
+
+    defaults = {'title': 'Sample Recepie', 'minutes_to_deliver': 10,
+                'price': Decimal('5.00')}
+    defaults.update(params)
+    return Recepie.objects.create(user=user, **defaults)
+
+
+class RecepieStatsTests(QueryBudgetMixin, TestCase):
+    """Test the stats kept up to date as recepies change"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertConsistent(self):
+        self.assertEqual(stats.check(self.user.pk), [])
+
+    def test_stats_summary(self):
+        """Test counts, averages, distribution & facets are returned"""
+
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        oats = Ingredient.objects.create(user=self.user, name='Oats')
+        first = sample_recepie(self.user, price=Decimal('4.00'), minutes_to_deliver=5)
+        first.tags.add(vegan, quick)
+        first.ingredients.add(oats)
+        second = sample_recepie(self.user, price=Decimal('8.50'), minutes_to_deliver=40)
+        second.tags.add(vegan)
+        sample_recepie(self.user, price=Decimal('1.00'), minutes_to_deliver=200)
+
+        response = self.client.get(STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recepies'], 3)
+        self.assertEqual(response.data['price'],
+                         {'total': '13.50', 'average': '4.50'})
+        self.assertEqual(response.data['minutes_to_deliver']['average'], 81.7)
+        self.assertEqual(
+            [bucket['count'] for bucket in
+             response.data['minutes_to_deliver']['distribution']],
+            [1, 0, 1, 0, 1])
+        self.assertEqual(response.data['tags'], [
+            {'id': vegan.id, 'name': 'Vegan', 'recepies': 2},
+            {'id': quick.id, 'name': 'Quick', 'recepies': 1}])
+        self.assertEqual(response.data['ingredients'], [
+            {'id': oats.id, 'name': 'Oats', 'recepies': 1}])
+
+    def test_stats_empty(self):
+        """Test users without recepies get empty stats"""
+
+        response = self.client.get(STATS_URL)
+
+        self.assertEqual(response.data['recepies'], 0)
+        self.assertIsNone(response.data['price']['average'])
+        self.assertEqual(response.data['tags'], [])
+
+    def test_stats_read_without_scanning(self):
+        """Test the stats cost the same queries however many recepies exist"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        def grow(count):
+            for _ in range(Recepie.objects.count(), count):
+                sample_recepie(self.user).tags.add(tag)
+            cache.clear()
+
+        self.assertQueriesDontScale(grow, lambda: self.client.get(STATS_URL))
+
+    def test_stats_cached_until_changed(self):
+        """Test repeated reads are cached & changes show up"""
+
+        sample_recepie(self.user)
+        self.client.get(STATS_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(STATS_URL)
+
+        sample_recepie(self.user)
+        self.assertEqual(self.client.get(STATS_URL).data['recepies'], 2)
+
+    def test_stats_follow_changes(self):
+        """Test every kind of write keeps the stats consistent"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        other_tag = Tag.objects.create(user=self.user, name='Dessert')
+        ingredient = Ingredient.objects.create(user=self.user, name='Oats')
+        recepie = sample_recepie(self.user)
+        recepie.tags.add(tag, other_tag)
+        recepie.ingredients.add(ingredient)
+        self.assertConsistent()
+
+        recepie.price = Decimal('7.25')
+        recepie.minutes_to_deliver = 90
+        recepie.save()
+        self.assertConsistent()
+
+        Recepie.objects.get(pk=recepie.pk).save()
+        recepie.tags.remove(tag, Tag.objects.create(user=self.user, name='Unused'))
+        self.assertConsistent()
+
+        second = sample_recepie(self.user)
+        tag.recepie_set.add(recepie, second)
+        other_tag.recepie_set.remove(second)
+        self.assertConsistent()
+
+        tag.recepie_set.clear()
+        recepie.ingredients.clear()
+        self.assertConsistent()
+
+        recepie.tags.set([tag])
+        other_tag.delete()
+        tag.delete()
+        self.assertConsistent()
+
+        recepie.ingredients.add(ingredient)
+        recepie.delete()
+        self.assertConsistent()
+        self.assertEqual(stats.summary(self.user.pk)['recepies'], 1)
+
+    def test_stats_follow_stale_instances(self):
+        """Test saving or deleting copies loaded before another write"""
+
+        recepie = sample_recepie(self.user)
+        first = Recepie.objects.get(pk=recepie.pk)
+        second = Recepie.objects.get(pk=recepie.pk)
+
+        first.price = Decimal('7.00')
+        first.save()
+        second.price = Decimal('9.00')
+        second.save()
+        self.assertConsistent()
+
+        first.minutes_to_deliver = 90
+        first.save()
+        second.delete()
+        self.assertConsistent()
+        self.assertEqual(stats.summary(self.user.pk)['recepies'], 0)
+
+    def test_stats_follow_bulk_changes(self):
+        """Test bulk creates, updates & deletes keep the stats consistent"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        other_tag = Tag.objects.create(user=self.user, name='Dessert')
+        response = self.client.post(BULK_URL, [
+            {'title': f'Recepie {index}', 'minutes_to_deliver': 10 * index,
+             'price': '5.00', 'tags': [tag.id], 'ingredients': []}
+            for index in range(3)], format='json')
+        ids = [item['id'] for item in response.data]
+        self.assertConsistent()
+
+        self.client.patch(BULK_URL, [
+            {'id': ids[0], 'price': '9.99', 'minutes_to_deliver': 120},
+            {'id': ids[1], 'tags': [other_tag.id]}], format='json')
+        self.assertConsistent()
+
+        self.client.delete(BULK_URL, ids[1:], format='json')
+        self.assertConsistent()
+        self.assertEqual(stats.summary(self.user.pk)['price']['total'], '9.99')
+
+    def test_deleting_user_drops_stats(self):
+        """Test no stats are left behind by a deleted user"""
+
+        sample_recepie(self.user).tags.add(
+            Tag.objects.create(user=self.user, name='Vegan'))
+
+        self.user.delete()
+
+        self.assertFalse(RecepieStat.objects.exists())
+
+
+class RecepieStatsCommandTests(TestCase):
+    """Test checking & rebuilding the stats"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+        sample_recepie(self.user).tags.add(
+            Tag.objects.create(user=self.user, name='Vegan'))
+
+    def test_check_consistent_stats(self):
+        """Test consistent stats pass the check"""
+
+        out = StringIO()
+        call_command('recepie_stats', stdout=out)
+
+        self.assertIn('consistent', out.getvalue())
+
+    def test_check_reports_and_rebuild_fixes(self):
+        """Test drifted rows are reported & rebuilt"""
+
+        RecepieStat.objects.filter(kind='tag').update(count=5)
+        out = StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command('recepie_stats', user=['test@example.com'], stdout=out)
+        self.assertIn('stored=(5, ', out.getvalue())
+
+        call_command('recepie_stats', rebuild=True, stdout=StringIO())
+        self.assertEqual(stats.check(self.user.pk), [])
+
+    def test_unknown_user(self):
+        """Test unknown emails are rejected"""
+
+        with self.assertRaises(CommandError):
+            call_command('recepie_stats', user=['nobody@example.com'])
@@ -1,22 +1,33 @@
 
 from os import path
-from django.db.models import query
-from rest_framework import viewsets, mixins, status
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When, query
+from rest_framework import viewsets, mixins, serializers, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from core.models import Tag, Ingredient, Recepie
+from user.authentication import CachedTokenAuthentication
+from .cache import LIST_TIMEOUT, response_key
+from .images import schedule_variants
+from .mixins import CachedListMixin, ConditionalGetMixin, RowListMixin, SparseFieldsetMixin
+from .pagination import RecepieCursorPagination, AttributeCursorPagination
+from .search import matching_ids
+from .stats import summary
 from .serializers import (RecepieDetailSerializer, TagSerializer, IngredientSerializer, RecepieSerializer,
-                          RecepieImageSerializer)
+                          RecepieImageSerializer, RecepieBulkSerializer)
 
 
-class BaseRecipieAttributes(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
+class BaseRecipieAttributes(ConditionalGetMixin, CachedListMixin, SparseFieldsetMixin, viewsets.GenericViewSet,
+                            mixins.ListModelMixin, mixins.CreateModelMixin):
     """Base class for recepies and ingreidents"""
 
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    pagination_class = AttributeCursorPagination
 
     def get_queryset(self):
         assigned_only = bool(
@@ -24,7 +35,8 @@ class BaseRecipieAttributes(viewsets.GenericViewSet, mixins.ListModelMixin, mixi
         queryset = self.queryset
         if assigned_only:
             queryset = queryset.filter(recepie__isnull=False)
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+        return self.narrow(
+            queryset.filter(user=self.request.user).order_by('-name', '-id').distinct())
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -44,16 +56,70 @@ class IngredientViewSet(BaseRecipieAttributes):
     serializer_class = IngredientSerializer
 
 
-class RecepieViewSet(viewsets.ModelViewSet):
+class RecepieViewSet(ConditionalGetMixin, SparseFieldsetMixin, RowListMixin, viewsets.ModelViewSet):
     """Manage recepies"""
 
     queryset = Recepie.objects.all()
     serializer_class = RecepieSerializer
     permission_classes = (IsAuthenticated, )
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
+    pagination_class = RecepieCursorPagination
+    # Recepies ranked by a search, its pages are paginated like lists
+    max_search_results = 200
+    ordering_fields = ('id', 'price', 'minutes_to_deliver')
+    range_filters = (
+        ('price_min', 'price__gte', serializers.DecimalField(
+            max_digits=5, decimal_places=2, min_value=0)),
+        ('price_max', 'price__lte', serializers.DecimalField(
+            max_digits=5, decimal_places=2, min_value=0)),
+        ('minutes_min', 'minutes_to_deliver__gte',
+         serializers.IntegerField(min_value=0)),
+        ('minutes_max', 'minutes_to_deliver__lte',
+         serializers.IntegerField(min_value=0)),
+    )
 
     def _parse_tags_to_int(self, qs):
-        return [int(str_id) for str_id in qs.split(',')]
+        try:
+            return [int(str_id) for str_id in qs.split(',')]
+        except ValueError:
+            raise ValidationError(
+                {'detail': 'Ids must be comma separated integers'})
+
+    def _match_all(self):
+        """Return True when recepies must match all the requested ids"""
+
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Must be either "any" or "all"'})
+        return match == 'all'
+
+    def _range_lookups(self):
+        """Return the lookups of the requested price & minutes ranges"""
+
+        lookups = {}
+        for param, lookup, field in self.range_filters:
+            value = self.request.query_params.get(param)
+            if value is not None:
+                try:
+                    lookups[lookup] = field.run_validation(value)
+                except serializers.ValidationError as exc:
+                    raise ValidationError({param: exc.detail})
+        return lookups
+
+    def get_ordering(self):
+        """Return the requested ordering, ties are broken by id"""
+
+        if self.action == 'search':
+            return ('search_position',)
+        ordering = self.request.query_params.get('ordering', '-id')
+        field = ordering.lstrip('-')
+        if field not in self.ordering_fields or ordering.startswith('--'):
+            raise ValidationError(
+                {'ordering': f'Must be one of {", ".join(self.ordering_fields)}, '
+                             'optionally prefixed with "-"'})
+        if field == 'id':
+            return (ordering,)
+        return (ordering, '-id' if ordering.startswith('-') else 'id')
 
     def get_queryset(self):
         """Receive Recepies related to authenticated user"""
@@ -61,12 +127,45 @@ class RecepieViewSet(viewsets.ModelViewSet):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredient')
         queryset = self.queryset
-        if tags:
-            queryset.filter(tags__id__in=self._parse_tags_to_int(tags))
-        if ingredients:
-            queryset.filter(
-                ingredients__id__in=self._parse_tags_to_int(ingredients))
-        return queryset.filter(user=self.request.user).order_by('-id')
+        if tags or ingredients:
+            match_all = self._match_all()
+            if tags:
+                queryset = queryset.with_tags(
+                    self._parse_tags_to_int(tags), match_all)
+            if ingredients:
+                queryset = queryset.with_ingredients(
+                    self._parse_tags_to_int(ingredients), match_all)
+        queryset = queryset.filter(
+            user=self.request.user, **self._range_lookups())
+        if self.action == 'search':
+            queryset = self._ranked(queryset)
+        queryset = queryset.order_by(*self.get_ordering())
+        if self.action in ('list', 'retrieve', 'search'):
+            return self._with_relations(queryset)
+        return queryset
+
+    def _ranked(self, queryset):
+        """Keep the recepies matching ``q``, numbered best match first"""
+
+        terms = self.request.query_params.get('q', '').strip()
+        if not terms:
+            raise ValidationError({'q': 'A search query is required'})
+        ids = matching_ids(queryset, self.request.user.pk, terms,
+                           self.max_search_results)
+        return queryset.filter(id__in=ids).annotate(search_position=Case(
+            *[When(id=recepie_id, then=Value(position))
+              for position, recepie_id in enumerate(ids)],
+            output_field=IntegerField()))
+
+    def _with_relations(self, queryset):
+        """Load the requested relations only, nested ones as objects"""
+
+        relations = [name for name in ('tags', 'ingredients') if self.wants(name)]
+        nested = [name for name in relations
+                  if self.action == 'retrieve' or name in self.expanded]
+        return self.narrow(queryset.with_related_ids(
+            [name for name in relations if name not in nested]
+        ).with_related_objects(nested))
 
     def get_serializer_class(self, *args, **kwargs):
         """Return appropiate serializer class """
@@ -75,6 +174,8 @@ class RecepieViewSet(viewsets.ModelViewSet):
             return RecepieDetailSerializer
         elif self.action == 'image_upload':
             return RecepieImageSerializer
+        elif self.action == 'bulk':
+            return RecepieBulkSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
@@ -87,6 +188,73 @@ class RecepieViewSet(viewsets.ModelViewSet):
         recepie = self.get_object()
         serializer = self.get_serializer(recepie, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(image_variants={})
+            schedule_variants(recepie.id)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(methods=['GET'], detail=False)
+    def search(self, request):
+        """Rank recepies matching ``q`` in their title, tag or ingredient names
+
+        Takes the filters of the list and returns pages of the best
+        ``max_search_results`` matches, best match first.
+        """
+
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """Summarize the user's recepies & count the use of each attribute"""
+
+        key = response_key(Recepie, request)
+        data = cache.get(key)
+        if data is None:
+            data = summary(request.user.pk)
+            cache.set(key, data, LIST_TIMEOUT)
+        return Response(data)
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        """Create, update or delete many recepies in one transaction
+
+        POST & PATCH take a list of recepies (PATCH items need an ``id``),
+        DELETE takes a list of ids. Errors are reported per item.
+        """
+
+        if not isinstance(request.data, list):
+            raise ValidationError({'detail': 'Expected a list of items'})
+
+        if request.method == 'DELETE':
+            ids = serializers.ListField(
+                child=serializers.IntegerField()).run_validation(request.data)
+            serializer = self.get_serializer(
+                self.get_queryset().filter(id__in=ids), many=True)
+            with transaction.atomic():
+                serializer.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        instances = None
+        if request.method == 'PATCH':
+            ids = [item.get('id') for item in request.data
+                   if isinstance(item, dict) and isinstance(item.get('id'), int)]
+            instances = self.get_queryset().filter(id__in=ids)
+
+        serializer = self.get_serializer(
+            instances, data=request.data, many=True,
+            partial=request.method == 'PATCH')
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            recepies = serializer.save()
+
+        queryset = self.get_queryset().filter(
+            id__in=[recepie.id for recepie in recepies]).with_related_ids()
+        data = RecepieSerializer(queryset, many=True).data
+        if request.method == 'POST':
+            return Response(data, status=status.HTTP_201_CREATED)
+        return Response(data, status=status.HTTP_200_OK)
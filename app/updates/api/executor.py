@@ -0,0 +1,51 @@
+"""Run blocking database work for async views on a bounded thread pool
+
+Django 3.2 has no async ORM. Async views hand their queries to this pool
+instead, so the event loop of ``app.asgi`` (whose middleware chain is all
+async) can keep many requests in flight while at most
+``ASYNC_DB_WORKERS`` threads (and database connections) do the work. The
+queries count towards the request's metrics like those of sync views.
+"""
+
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.middleware import record_queries
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_WORKERS,
+                thread_name_prefix='async-db')
+    return _executor
+
+
+def _call(fn, *args, **kwargs):
+    # Pool threads keep their connections, expire them like request threads
+    close_old_connections()
+    record_queries()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(fn, *args, **kwargs):
+    """Await ``fn(*args, **kwargs)`` run on the database pool"""
+
+    # sync_to_async carries the request's context (and query recorder) over
+    return await sync_to_async(
+        functools.partial(_call, fn), thread_sensitive=False,
+        executor=get_executor())(*args, **kwargs)
@@ -0,0 +1,44 @@
+"""Keyset pagination for the updates API"""
+
+from django.core.exceptions import BadRequest
+
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _int_param(request, name, default=None):
+    value = request.GET.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f'{name} must be an integer')
+
+
+def paginate(request, queryset):
+    """Return a page of the newest updates & the url of the next page
+
+    The ``cursor`` query param is the id of the last update already seen, so
+    every page is a bounded index range scan no matter how deep it is.
+    """
+
+    cursor = _int_param(request, 'cursor')
+    page_size = _int_param(request, 'page_size', PAGE_SIZE)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    queryset = queryset.order_by('-id')
+    if cursor is not None:
+        queryset = queryset.filter(id__lt=cursor)
+    ids = list(queryset.values_list('id', flat=True)[:page_size + 1])
+
+    next_url = None
+    if len(ids) > page_size:
+        ids = ids[:page_size]
+        params = request.GET.copy()
+        params['cursor'] = ids[-1]
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{params.urlencode()}')
+
+    return queryset.model.objects.filter(id__in=ids).order_by('-id'), next_url
@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import UpdateModelDetailAPI, UpdateModelListAPI
+from .views import (UpdateModelDetailAPI, UpdateModelListAPI, async_update_detail,
+                    async_update_list)
 
 
 urlpatterns = [
+    path('async/<id>/', async_update_detail),
+    path('async/', async_update_list),
     path('<id>/', UpdateModelDetailAPI.as_view()),
     path('', UpdateModelListAPI.as_view())
 
@@ -1,13 +1,21 @@
+import functools
+import logging
+
 from django.views.generic import View
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
 
 from updates.models import UpdateModel
+from .executor import run_db
+from .pagination import paginate
+
+
+logger = logging.getLogger(__name__)
 
 
 class UpdateModelDetailAPI(View):
     def get(self, request, id, *args, **kwargs):
         obj = UpdateModel.objects.filter(id=id)
-        print('found object', obj)
+        logger.debug('Update detail requested', extra={'update_id': id})
         json_response = obj.serialize()
         return HttpResponse(json_response, content_type='application/json')
 
@@ -23,9 +31,50 @@ class UpdateModelDetailAPI(View):
 
 class UpdateModelListAPI(View):
     def get(self, request, *args, **kwargs):
-        qs = UpdateModel.objects.all()
-        json_response = qs.serialize()
-        return HttpResponse(json_response, content_type='application/json')
+        qs, next_url = paginate(request, UpdateModel.objects.all())
+        response = StreamingHttpResponse(
+            qs.iter_json(), content_type='application/json')
+        if next_url:
+            response['Link'] = f'<{next_url}>; rel="next"'
+        return response
 
     def post(self, request, *args, **kwargs):
         return HttpResponse({}, content_type='application/json')
+
+
+def async_get(view):
+    """Answer other methods than GET with 405, keeping ``view`` a coroutine
+
+    Django 3.2 runs coroutine functions natively under ASGI, but has no async
+    class based views nor async ``require_GET``.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _page(request):
+    queryset, next_url = paginate(request, UpdateModel.objects.all())
+    return queryset.serialize(), next_url
+
+
+@async_get
+async def async_update_detail(request, id):
+    json_response = await run_db(
+        lambda: UpdateModel.objects.filter(id=id).serialize())
+    return HttpResponse(json_response, content_type='application/json')
+
+
+@async_get
+async def async_update_list(request):
+    # A page is at most MAX_PAGE_SIZE rows, so it is rendered in full;
+    # streaming would run the queries on the event loop
+    json_response, next_url = await run_db(_page, request)
+    response = HttpResponse(json_response, content_type='application/json')
+    if next_url:
+        response['Link'] = f'<{next_url}>; rel="next"'
+    return response
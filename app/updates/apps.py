@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UpdatesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'updates'
+
+    def ready(self):
+        from core import media
+        from .models import UpdateModel
+
+        media.track(UpdateModel, lambda update: [update.image.name])
@@ -0,0 +1,44 @@
+""" Command comparing the sync & async updates APIs under load """
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.benchmark import run_load
+
+
+ENDPOINTS = (
+    ('sync', '/api/updates/'),
+    ('async', '/api/updates/async/'),
+)
+
+
+class Command(BaseCommand):
+    """ Django command load testing a running server's updates APIs """
+
+    help = ('Fetch the sync and async updates list from a server running '
+            '`serve --asgi` with concurrent clients and report throughput & '
+            'latency. Async views only run concurrently under ASGI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000',
+                            help='Base url of the running ASGI server')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        base = options['url'].rstrip('/')
+        results = {}
+        for name, path in ENDPOINTS:
+            results[name] = run_load(
+                [base + path], options['requests'], options['concurrency'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:>5}: {result["requests_per_second"]} req/s, '
+                f'p50 {result["p50_ms"]} ms, p95 {result["p95_ms"]} ms, '
+                f'p99 {result["p99_ms"]} ms, {result["errors"]} errors')
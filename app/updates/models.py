@@ -8,10 +8,30 @@ def upload_update_iamge(instance, image_name):
 
 
 class UpdateQuerySet(models.QuerySet):
+    serialized_fields = ('user', 'content', 'image', 'id')
+
     def serialize(self):
-        qs = list(self.values('user', 'content', 'image', 'id'))
-        print(qs)
-        return json.dumps(qs)
+        return ''.join(self.iter_json())
+
+    def iter_json(self, chunk_size=1000):
+        """Yield the queryset as a JSON array, ``chunk_size`` rows at a time
+
+        Rows are read with ``iterator()`` (a server side cursor on Postgres)
+        so memory use doesn't grow with the number of updates.
+        """
+
+        rows = self.values(*self.serialized_fields).iterator(
+            chunk_size=chunk_size)
+        yield '['
+        separator, chunk = '', []
+        for row in rows:
+            chunk.append(json.dumps(row))
+            if len(chunk) == chunk_size:
+                yield separator + ', '.join(chunk)
+                separator, chunk = ', ', []
+        if chunk:
+            yield separator + ', '.join(chunk)
+        yield ']'
 
 
 class UpdateManager(models.Manager):
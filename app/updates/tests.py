@@ -1,3 +1,238 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from core.testing import asgi_application, asgi_get, asgi_live_server
+from .models import UpdateModel, UpdateQuerySet
+
+
+UPDATES_URL = '/api/updates/'
+ASYNC_UPDATES_URL = '/api/updates/async/'
+
+
+def response_json(response):
+    """Decode a (streamed) JSON response"""
+
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
+def sample_update(user, content='Sample update'):
+    """Create and return a sample update"""
+
+    return UpdateModel.objects.create(user=user, content=content)
+
+
+class UpdateListAPITests(TestCase):
+    """Test the updates list API"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+
+    def test_list_updates_newest_first(self):
+        """Test updates are listed newest first"""
+
+        first = sample_update(self.user, 'First')
+        second = sample_update(self.user, 'Second')
+
+        response = self.client.get(UPDATES_URL)
+        data = response_json(response)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in data],
+                         [second.id, first.id])
+        self.assertNotIn('Link', response)
+
+    def test_list_updates_paginated_by_cursor(self):
+        """Test following the next link walks through every update"""
+
+        updates = [sample_update(self.user, f'Update {i}') for i in range(5)]
+
+        seen = []
+        url = f'{UPDATES_URL}?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(item['id'] for item in response_json(response))
+            link = response.get('Link')
+            url = link[1:link.index('>')] if link else None
+
+        self.assertEqual(seen, [update.id for update in reversed(updates)])
+
+    def test_list_updates_page_size_is_bounded(self):
+        """Test page size can't exceed the maximum"""
+
+        for i in range(3):
+            sample_update(self.user, f'Update {i}')
+
+        with patch('updates.api.pagination.MAX_PAGE_SIZE', 2):
+            response = self.client.get(UPDATES_URL, {'page_size': 1000})
+
+        self.assertEqual(len(response_json(response)), 2)
+        self.assertIn('Link', response)
+
+    def test_list_updates_invalid_cursor(self):
+        """Test an invalid cursor is rejected"""
+
+        response = self.client.get(UPDATES_URL, {'cursor': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncUpdateAPITests(TransactionTestCase):
+    """Test the async updates APIs, whose queries run on other threads"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+
+    def test_async_list_matches_sync(self):
+        """Test the async list returns the same pages as the sync one"""
+
+        for i in range(3):
+            sample_update(self.user, f'Update {i}')
+
+        sync = self.client.get(UPDATES_URL, {'page_size': 2})
+        response = self.client.get(ASYNC_UPDATES_URL, {'page_size': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_json(response), response_json(sync))
+        self.assertIn(f'{ASYNC_UPDATES_URL}?page_size=2&cursor=',
+                      response['Link'])
+
+    def test_async_detail(self):
+        """Test fetching one update asynchronously"""
+
+        update = sample_update(self.user)
+
+        response = self.client.get(f'{ASYNC_UPDATES_URL}{update.id}/')
+
+        self.assertEqual(response_json(response)[0]['content'], update.content)
+
+    def test_async_queries_counted(self):
+        """Test queries run on the pool count towards the request"""
+
+        sample_update(self.user)
+
+        response = self.client.get(ASYNC_UPDATES_URL)
+
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+    def test_async_invalid_cursor(self):
+        """Test errors raised on the pool become responses"""
+
+        response = self.client.get(ASYNC_UPDATES_URL, {'cursor': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_method_not_allowed(self):
+        """Test unsupported methods are rejected"""
+
+        response = self.client.delete(ASYNC_UPDATES_URL)
+
+        self.assertEqual(response.status_code, 405)
+
+
+class ASGIUpdateAPITests(TransactionTestCase):
+    """Test the updates APIs served by the ASGI application"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+        self.application = asgi_application()
+
+    def test_sync_list_streams(self):
+        """Test the streamed list queries off the event loop"""
+
+        sample_update(self.user)
+
+        status, body = async_to_sync(asgi_get)(self.application, UPDATES_URL)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(body)), 1)
+
+    def test_async_requests_run_concurrently(self):
+        """Test async views don't wait for each other's queries"""
+
+        def slow_serialize(queryset):
+            time.sleep(0.5)
+            return '[]'
+
+        async def get_all(count):
+            return await asyncio.gather(*(
+                asgi_get(self.application, f'{ASYNC_UPDATES_URL}{index}/')
+                for index in range(count)))
+
+        with patch.object(UpdateQuerySet, 'serialize', slow_serialize):
+            start = time.perf_counter()
+            responses = async_to_sync(get_all)(4)
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual([status for status, _ in responses], [200] * 4)
+        # One after the other they would take 2 seconds
+        self.assertLess(elapsed, 1)
+
+
+class BenchUpdatesTests(TransactionTestCase):
+    """Test the sync vs async benchmark"""
+
+    def test_bench_updates(self):
+        """Test both endpoints are measured on the ASGI server"""
+
+        out = StringIO()
+        with asgi_live_server(asgi_application()) as url:
+            call_command('bench_updates', url=url, requests=4,
+                         concurrency=2, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+
+        self.assertEqual(set(results), {'sync', 'async'})
+        self.assertEqual(results['sync']['errors'], 0)
+        self.assertEqual(results['async']['errors'], 0)
+        self.assertEqual(results['sync']['requests'], 4)
+
+
+class UpdateQuerySetTests(TestCase):
+    """Test serializing updates to JSON"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+
+    def test_iter_json_matches_serialize(self):
+        """Test streamed chunks join into the same JSON as serialize"""
+
+        for i in range(5):
+            sample_update(self.user, f'Update {i}')
+        queryset = UpdateModel.objects.order_by('id')
+
+        chunks = list(queryset.iter_json(chunk_size=2))
+        expected = json.dumps(list(queryset.values('user', 'content', 'image', 'id')))
+
+        self.assertEqual(''.join(chunks), expected)
+        self.assertEqual(queryset.serialize(), expected)
+        # Opening & closing brackets plus three chunks of at most two rows
+        self.assertEqual(len(chunks), 5)
+
+    def test_iter_json_empty_queryset(self):
+        """Test an empty queryset streams an empty JSON array"""
+
+        self.assertEqual(UpdateModel.objects.none().serialize(), '[]')
+
+    def test_export_view_streams(self):
+        """Test the export view streams every update"""
+
+        for i in range(3):
+            sample_update(self.user, f'Update {i}')
+
+        response = self.client.get('/updates/ser')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(response_json(response)), 3)
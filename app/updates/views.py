@@ -1,5 +1,5 @@
 from django.db.models import fields
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from .mixinx import JsonResponseMixin
 from django.views.generic import View
@@ -38,10 +38,10 @@ class JsonView(JsonResponseMixin, View):
 class SerializerListView(View):
     def get(self, request, *args, **kwargs):
 
-        qs = UpdateModel.objects.all().serialize()
+        qs = UpdateModel.objects.all().iter_json()
         # data = serialize('json', qs, fields=('user', 'content'))
 
-        return HttpResponse(qs, content_type='application/json')
+        return StreamingHttpResponse(qs, content_type='application/json')
 
 
 class SerializerDetailsView(View):
@@ -0,0 +1,139 @@
+"""Token authentication backed by a cache of token lookups"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core import metrics
+
+
+class TokenCache:
+    """Bounded, thread safe LRU of token key to token (with its user)
+
+    Entries expire ``ttl`` seconds after they're stored. When
+    ``shared_alias`` names one of ``CACHES`` it's used instead of the
+    process' own entries, so workers share lookups and invalidations: a
+    token deleted by one worker is rejected by all of them.
+    """
+
+    def __init__(self, max_size, ttl, shared_alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _shared_key(self, key):
+        return f'authtoken:{key}'
+
+    def get(self, key):
+        """Return the cached token of ``key`` or None"""
+
+        if self.shared:
+            token = self.shared.get(self._shared_key(key))
+            with self._lock:
+                if token is None:
+                    self.misses += 1
+                else:
+                    self.shared_hits += 1
+            return token
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def set(self, key, token):
+        if self.shared:
+            self.shared.set(self._shared_key(key), token, self.ttl)
+        else:
+            self._store(key, token)
+
+    def _store(self, key, token):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared:
+            self.shared.delete(self._shared_key(key))
+
+    def delete_user(self, user_id, keys=()):
+        """Drop every cached token of a user, ``keys`` are known token keys"""
+
+        with self._lock:
+            cached = [key for key, (_, token) in self._entries.items()
+                      if token.user_id == user_id]
+        for key in set(cached) | set(keys):
+            self.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'shared_hits': self.shared_hits,
+                    'misses': self.misses, 'size': len(self._entries)}
+
+
+token_cache = TokenCache(settings.TOKEN_AUTH_CACHE_SIZE,
+                         settings.TOKEN_AUTH_CACHE_TTL,
+                         settings.TOKEN_AUTH_SHARED_CACHE)
+
+
+def _lookups():
+    stats = token_cache.stats()
+    return [({'result': result}, stats[result])
+            for result in ('hits', 'shared_hits', 'misses')]
+
+
+metrics.registry.collector(
+    'token_auth_cache_lookups_total',
+    'Token lookups answered by this process, the shared cache or neither',
+    _lookups, kind='counter')
+metrics.registry.collector(
+    'token_auth_cache_size', 'Tokens cached by this process',
+    lambda: [({}, token_cache.stats()['size'])])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the database for known tokens"""
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            token = super().authenticate_credentials(key)[1]
+            token_cache.set(key, token)
+
+        # Copies, so requests never share the cached instances
+        user = copy.copy(token.user)
+        token = copy.copy(token)
+        token.user = user
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, token)
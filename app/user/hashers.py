@@ -0,0 +1,16 @@
+"""Password hashers with a work factor set from the settings"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher running ``PASSWORD_HASH_ITERATIONS`` iterations
+
+    Keeps the ``pbkdf2_sha256`` algorithm name so existing hashes verify, and
+    hashes made with another iteration count are upgraded on the next login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
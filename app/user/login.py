@@ -0,0 +1,76 @@
+"""Password checks for logins on a bounded pool of threads
+
+Hashing a password is deliberately slow, so a burst of logins running on the
+request threads takes the CPU from every other request. Checks run on
+``LOGIN_HASH_WORKERS`` threads instead, with at most ``LOGIN_QUEUE_DEPTH``
+waiting; logins past that are rejected straight away.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib import auth
+from django.db import close_old_connections
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import Throttled
+
+
+class LoginQueueFull(Throttled):
+    default_detail = _('Too many logins in progress, try again shortly.')
+
+
+class BoundedExecutor:
+    """Thread pool refusing work once ``workers + depth`` tasks are pending"""
+
+    def __init__(self, workers, depth):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='login')
+        self._slots = threading.BoundedSemaphore(workers + depth)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise LoginQueueFull()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BoundedExecutor(
+                settings.LOGIN_HASH_WORKERS, settings.LOGIN_QUEUE_DEPTH)
+    return _executor
+
+
+def _authenticate(request, email, password):
+    # Pool threads keep their connections, expire them like request threads
+    close_old_connections()
+    try:
+        return auth.authenticate(request, email=email, password=password)
+    finally:
+        close_old_connections()
+
+
+def authenticate(request, email, password):
+    """Return the active user with these credentials, or None
+
+    Runs ``django.contrib.auth.authenticate()`` (every backend of
+    ``AUTHENTICATION_BACKENDS``, sending ``user_login_failed``) on the login
+    pool. Raises ``LoginQueueFull`` when the pool is saturated.
+    """
+
+    return get_executor().run(_authenticate, request, email, password)
@@ -0,0 +1,47 @@
+""" Command measuring how many logins a core can check per second """
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.core.management.base import BaseCommand
+
+
+def _check_for(encoded, password, seconds):
+    """Check the password against its hash for ``seconds``, return the count"""
+
+    checks = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        check_password(password, encoded)
+        checks += 1
+    return checks
+
+
+class Command(BaseCommand):
+    """ Django command benchmarking the configured password hasher """
+
+    help = 'Measure password checks per second per core with the configured hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5,
+                            help='How long each process checks passwords')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                            help='Number of processes checking in parallel')
+
+    def handle(self, *args, **options):
+        seconds, processes = options['seconds'], options['processes']
+        hasher = get_hasher()
+        password = 'benchmark-password'
+        encoded = make_password(password)
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            counts = list(executor.map(
+                _check_for, [encoded] * processes, [password] * processes,
+                [seconds] * processes))
+
+        total = sum(counts) / seconds
+        self.stdout.write(
+            f'{hasher.algorithm} ({getattr(hasher, "iterations", "-")} iterations): '
+            f'{total:.1f} logins/s on {processes} processes, '
+            f'{total / processes:.1f} logins/s per core')
@@ -1,11 +1,14 @@
 """User app serializers """
 
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
+from . import login
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the user object"""
 
     class Meta:
@@ -43,8 +46,7 @@ class AuthTokenSerializer(serializers.Serializer):
         email = attrs.get('email')
         password = attrs.get('password')
 
-        user = authenticate(request=self.context.get(
-            'request'), email=email, password=password)
+        user = login.authenticate(self.context.get('request'), email, password)
         if not user:
             message = _('Unable to authenticate user with given credentials')
             raise serializers.ValidationError(message, code='authentication')
@@ -0,0 +1,26 @@
+"""Keep cached token lookups in line with tokens & users"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, **kwargs):
+    # Deactivations, password & profile changes
+    invalidate_user(instance)
+
+
+def invalidate_user(user):
+    """Forget every cached token of ``user``"""
+
+    keys = Token.objects.filter(user=user).values_list('key', flat=True)
+    token_cache.delete_user(user.pk, keys)
@@ -0,0 +1,154 @@
+""" Cached token authentication tests """
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenCache, token_cache
+
+
+ME = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached & invalidated"""
+
+    def setUp(self) -> None:
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345', name='Test')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_token_lookup(self):
+        """Test a cached token authenticates without queries"""
+
+        self.client.get(ME)
+        hits = token_cache.hits
+
+        with self.assertNumQueries(0):
+            response = self.client.get(ME)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.hits, hits + 1)
+
+    def test_deleted_token_rejected(self):
+        """Test deleting a token evicts it"""
+
+        self.client.get(ME)
+        self.token.delete()
+
+        response = self.client.get(ME)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user evicts their tokens"""
+
+        self.client.get(ME)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(ME)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_inactive_user_rejected(self):
+        """Test a cached token of an inactive user is answered with 401"""
+
+        token = Token.objects.select_related('user').get(key=self.token.key)
+        token.user.is_active = False
+        token_cache.set(token.key, token)
+
+        response = self.client.get(ME)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_refreshes_user(self):
+        """Test updating the password through the API evicts the token"""
+
+        self.client.get(ME)
+        self.client.patch(ME, {'name': 'Renamed', 'password': 'admin123456'})
+
+        misses = token_cache.misses
+        response = self.client.get(ME)
+
+        self.assertEqual(token_cache.misses, misses + 1)
+        self.assertEqual(response.data['name'], 'Renamed')
+
+    def test_invalid_token_rejected(self):
+        """Test unknown tokens are still rejected"""
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        response = self.client.get(ME)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenCacheTests(TestCase):
+    """Test the bounded token cache"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='admin12345')
+        self.token = Token.objects.create(user=self.user)
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache never grows over its size"""
+
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', self.token)
+        cache.set('b', self.token)
+        cache.get('a')
+        cache.set('c', self.token)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_entries_expire(self):
+        """Test entries are dropped after the ttl"""
+
+        cache = TokenCache(max_size=2, ttl=60)
+        with patch('time.monotonic', return_value=100):
+            cache.set('a', self.token)
+        with patch('time.monotonic', return_value=161):
+            self.assertIsNone(cache.get('a'))
+
+    def test_stats_in_metrics(self):
+        """Test the lookups of the process' token cache are exported"""
+
+        token_cache.clear()
+        token_cache.get('unknown')
+
+        with self.settings(METRICS_TOKEN='scrape-secret'):
+            body = self.client.get(
+                reverse('metrics'),
+                HTTP_AUTHORIZATION='Bearer scrape-secret').content.decode()
+
+        self.assertIn('# TYPE token_auth_cache_lookups_total counter', body)
+        self.assertIn(
+            f'token_auth_cache_lookups_total{{result="misses"}} '
+            f'{token_cache.stats()["misses"]}', body)
+        self.assertIn('token_auth_cache_size 0', body)
+
+    def test_shared_tier(self):
+        """Test workers share lookups through the shared cache"""
+
+        first = TokenCache(max_size=2, ttl=60, shared_alias='default')
+        second = TokenCache(max_size=2, ttl=60, shared_alias='default')
+        first.set('shared', self.token)
+
+        self.assertEqual(second.get('shared').key, self.token.key)
+        self.assertEqual(second.shared_hits, 1)
+
+        first.delete('shared')
+        self.assertIsNone(second.get('shared'))
@@ -1,14 +1,23 @@
 """ User APIs tests """
 
+from io import StringIO
+from unittest.mock import patch
+
 from django import urls
+from django.core.cache import cache
+from django.core.management import call_command
 from django.http import response
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from user import login
+from user.throttling import LoginEmailThrottle, LoginIPThrottle
+
 
 ME = reverse('user:me')
 TOKEN_URL = reverse('user:token')
@@ -20,10 +29,11 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
-class PublicUserAPITests(TestCase):
-    """ Tests for Public User APIs """
+class PublicUserAPITests(TransactionTestCase):
+    """ Tests for Public User APIs, logins query on the login pool's threads """
 
     def setUp(self) -> None:
+        cache.clear()
         self.client = APIClient()
 
     def test_create_valid_user_success(self):
@@ -99,6 +109,107 @@ class PublicUserAPITests(TestCase):
         self.assertNotIn('token', response.data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_login_throttled_per_email(self):
+        """Test repeated logins for one email are rejected before hashing"""
+
+        payload = {'email': 'test@example.com', 'password': 'pw'}
+        rates = {'login_email': '2/min', 'login_ip': '100/min'}
+
+        with patch.object(LoginEmailThrottle, 'THROTTLE_RATES', rates), \
+                patch.object(LoginIPThrottle, 'THROTTLE_RATES', rates), \
+                patch.object(login, 'authenticate', return_value=None) as authenticate:
+            for _ in range(2):
+                self.client.post(TOKEN_URL, payload)
+            response = self.client.post(TOKEN_URL, payload)
+            other = self.client.post(
+                TOKEN_URL, {'email': 'other@example.com', 'password': 'pw'})
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(authenticate.call_count, 3)
+
+    def test_login_throttled_per_ip(self):
+        """Test logins from one address are limited across emails"""
+
+        rates = {'login_email': '100/min', 'login_ip': '1/min'}
+
+        with patch.object(LoginEmailThrottle, 'THROTTLE_RATES', rates), \
+                patch.object(LoginIPThrottle, 'THROTTLE_RATES', rates):
+            self.client.post(TOKEN_URL, {'email': 'a@example.com', 'password': 'pw'})
+            response = self.client.post(
+                TOKEN_URL, {'email': 'b@example.com', 'password': 'pw'})
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_login_rejected_when_queue_full(self):
+        """Test logins fail fast with 429 when the hashing pool is saturated"""
+
+        create_user(email='test@example.com', password='admin12345')
+        executor = login.BoundedExecutor(workers=1, depth=0)
+        executor._slots.acquire()
+
+        with patch.object(login, 'get_executor', return_value=executor):
+            response = self.client.post(
+                TOKEN_URL, {'email': 'test@example.com', 'password': 'admin12345'})
+            executor._slots.release()
+            retried = self.client.post(
+                TOKEN_URL, {'email': 'test@example.com', 'password': 'admin12345'})
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('token', retried.data)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_login_upgrades_hash_iterations(self):
+        """Test hashes made with another work factor are upgraded on login"""
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            user = create_user(email='test@example.com', password='admin12345')
+        self.assertIn('$2000$', user.password)
+
+        response = self.client.post(
+            TOKEN_URL, {'email': 'test@example.com', 'password': 'admin12345'})
+        user.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('$1000$', user.password)
+        self.assertTrue(user.check_password('admin12345'))
+
+    def test_failed_login_signalled(self):
+        """Test logins go through the auth backends & report failures"""
+
+        create_user(email='test@example.com', password='admin12345')
+        failures = []
+        user_login_failed.connect(
+            lambda **kwargs: failures.append(kwargs['credentials']['email']),
+            weak=False, dispatch_uid='test_failed_login_signalled')
+        self.addCleanup(user_login_failed.disconnect,
+                        dispatch_uid='test_failed_login_signalled')
+
+        self.client.post(
+            TOKEN_URL, {'email': 'test@example.com', 'password': 'wrong'})
+
+        self.assertEqual(failures, ['test@example.com'])
+
+    def test_inactive_user_cannot_login(self):
+        """Test inactive users don't get a token"""
+
+        create_user(email='test@example.com', password='admin12345',
+                    is_active=False)
+
+        response = self.client.post(
+            TOKEN_URL, {'email': 'test@example.com', 'password': 'admin12345'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bench_login(self):
+        """Test the benchmark reports logins per core"""
+
+        out = StringIO()
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            call_command('bench_login', seconds=0.1, processes=1, stdout=out)
+
+        self.assertIn('logins/s per core', out.getvalue())
+
     def test_retrieve_user_un_authorized(self):
         """Test that authentication is required for Users"""
 
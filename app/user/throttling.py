@@ -0,0 +1,26 @@
+"""Throttles applied before any password is hashed"""
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    """Limit the login attempts of a client address"""
+
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginEmailThrottle(SimpleRateThrottle):
+    """Limit the login attempts against one account, from any address"""
+
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email:
+            return None
+        return self.cache_format % {
+            'scope': self.scope, 'ident': email.strip().lower()}
@@ -1,9 +1,11 @@
 """User API views"""
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from .authentication import CachedTokenAuthentication
 from .serializers import UserSerializer, AuthTokenSerializer
+from .throttling import LoginEmailThrottle, LoginIPThrottle
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -17,13 +19,14 @@ class CreateTokenView(ObtainAuthToken):
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginIPThrottle, LoginEmailThrottle)
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage authenticated users"""
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):